@@ -1,31 +1,141 @@
 # backend/app.py
 import os
 import json
+import base64
+import struct
+import time
+import uuid
+import asyncio
 import yaml
-from typing import Dict, Any, List
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from models.asr_backends import parse_model_spec
+from models.asr_scheduler import ASRBusyError
+from models.openai_manager import OpenAIManager
+from models.tts_cache import TTSCache
 from models.tts_espnet import TTSManager
+from models.tts_executor import PRIORITY_HIGH, PRIORITY_LOW, TTSBusyError, TTSExecutor
+from models.streaming_asr import StreamingTranscript
+from models.vad import Endpointer
 from models.whisper_manager import WhisperManager
+from models.worker_pool import ModelWorkerPool
+from utils.admission import AudioInbox, InflightLimiter, ServerBusyError
+from utils.command_matcher import CommandMatcher
+from utils import metrics
+from utils.conversation import ConversationHistory
+from utils.history_writer import create_history_writer
+from utils.readiness import Readiness
+from utils.response_cache import ResponseCache
+from utils.sentence_splitter import SentenceSplitter
+from utils.session_store import create_session_store
 
 # ====== 環境変数 ======
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise RuntimeError("Set OPENAI_API_KEY")
 
-# OpenAI SDK v1
-from openai import OpenAI
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
-
 DEFAULT_OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o")
+OPENAI_MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", "16"))
+OPENAI_TIMEOUT_SEC = float(os.environ.get("OPENAI_TIMEOUT_SEC", "60"))
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "3"))
+# 1 なら起動時に軽い API 呼び出しで OpenAI への接続を張っておく（初回ターンの TLS 待ちを無くす）
+OPENAI_WARM_CONNECTION = os.environ.get("OPENAI_WARM_CONNECTION", "1") == "1"
+# 会話履歴のトークン予算（超過分はローリング要約へ畳み込み）
+HISTORY_MAX_TOKENS = int(os.environ.get("HISTORY_MAX_TOKENS", "3000"))
+HISTORY_KEEP_TOKENS = int(os.environ.get("HISTORY_KEEP_TOKENS", "1500"))
+HISTORY_SUMMARY_MODEL = os.environ.get("HISTORY_SUMMARY_MODEL")  # 未指定なら現在のモデル
+# LLM応答キャッシュ（対象モードを指定した場合のみ有効。例: "アラート,タイマー"）
+LLM_CACHE_MODES = [m.strip() for m in os.environ.get("LLM_CACHE_MODES", "").split(",") if m.strip()]
+LLM_CACHE_TTL_SEC = float(os.environ.get("LLM_CACHE_TTL_SEC", "3600"))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_CACHE_CONTEXT_TURNS = int(os.environ.get("LLM_CACHE_CONTEXT_TURNS", "2"))
+# 類似文脈でもヒットさせる場合のしきい値（0〜1、空なら完全一致のみ）
+LLM_CACHE_NEAR_DUP = float(os.environ["LLM_CACHE_NEAR_DUP"]) if os.environ.get("LLM_CACHE_NEAR_DUP") else None
+# 1 にするとステージごとの所要時間をセッションのトレースIDつきでログ出力
+metrics.TRACE_ENABLED = os.environ.get("METRICS_TRACE", "0") == "1"
+# セッション保存先（memory / sqlite）。sqlite なら複数ワーカー間で共有・再接続時に再開可
+SESSION_STORE = os.environ.get("SESSION_STORE", "memory")
+SESSION_DB_PATH = os.environ.get("SESSION_DB_PATH", os.path.join("backend", "data", "sessions.db"))
+SESSION_FLUSH_MS = int(os.environ.get("SESSION_FLUSH_MS", "500"))
+SESSION_TTL_SEC = float(os.environ.get("SESSION_TTL_SEC", "86400"))  # 最終更新からの保持期間（0=無期限）
+# 会話ログ（jsonl / sqlite、空なら保存しない）。まとめ書き・サイズ/時間でローテーション
+TEXT_HISTORY_BACKEND = os.environ.get("TEXT_HISTORY_BACKEND", "jsonl")
+TEXT_HISTORY_PATH = os.environ.get("TEXT_HISTORY_PATH", "")
+TEXT_HISTORY_FLUSH_MS = int(os.environ.get("TEXT_HISTORY_FLUSH_MS", "1000"))
+TEXT_HISTORY_ROTATE_MB = int(os.environ.get("TEXT_HISTORY_ROTATE_MB", "64"))
+TEXT_HISTORY_ROTATE_HOURS = float(os.environ.get("TEXT_HISTORY_ROTATE_HOURS", "24"))
+TEXT_HISTORY_MAX_PENDING = int(os.environ.get("TEXT_HISTORY_MAX_PENDING", "10000"))
 ESPNET_MODEL_TAG = os.environ.get("ESPNET_MODEL_TAG", "kan-bayashi/ljspeech_vits")
 ESPNET_DEVICE = os.environ.get("ESPNET_DEVICE", "cpu")
+# TTS音声キャッシュ（0 で無効、TTS_CACHE_DIR 指定でディスクにも保存）
+TTS_CACHE_MAX_MB = int(os.environ.get("TTS_CACHE_MAX_MB", "64"))
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR") or None
+TTS_CACHE_DISK_MAX_MB = int(os.environ.get("TTS_CACHE_DISK_MAX_MB", "512"))  # 0 でディスク側は無制限
+# TTS出力フォーマット: wav / ogg(Vorbis) / opus(OGG/Opus)
+TTS_AUDIO_FORMAT = os.environ.get("TTS_AUDIO_FORMAT", "wav")
+# TTS専用エグゼキュータ（同時合成数・ワーカーあたりtorchスレッド数・待ち行列上限）
+TTS_WORKERS = int(os.environ.get("TTS_WORKERS", "0"))  # 0 ならワーカープロセス数（無ければ 2）
+TTS_TORCH_THREADS = int(os.environ.get("TTS_TORCH_THREADS", "0"))  # 0 なら torch の既定
+TTS_QUEUE_MAX = int(os.environ.get("TTS_QUEUE_MAX", "32"))
 DEFAULT_WHISPER_MODEL = os.environ.get("WHISPER_MODEL_NAME", "small")
+WHISPER_BATCH_WINDOW_MS = float(os.environ.get("WHISPER_BATCH_WINDOW_MS", "20"))
+WHISPER_MAX_BATCH = int(os.environ.get("WHISPER_MAX_BATCH", "8"))
+# ASR エンジン（whisper_streaming / faster_whisper）。モデル名を "faster:small" のように書けば個別に指定可
+ASR_ENGINE = os.environ.get("ASR_ENGINE", "whisper_streaming")
+ASR_LANGUAGE = os.environ.get("ASR_LANGUAGE") or None  # 未指定なら自動判定
+# faster-whisper（CTranslate2）: CPU は int8 量子化推奨。スレッド数は 0 で自動
+FASTER_WHISPER_DEVICE = os.environ.get("FASTER_WHISPER_DEVICE", "cpu")
+FASTER_WHISPER_COMPUTE_TYPE = os.environ.get("FASTER_WHISPER_COMPUTE_TYPE", "int8")
+FASTER_WHISPER_BEAM_SIZE = int(os.environ.get("FASTER_WHISPER_BEAM_SIZE", "1"))
+FASTER_WHISPER_CPU_THREADS = int(os.environ.get("FASTER_WHISPER_CPU_THREADS", "0"))
+FASTER_WHISPER_NUM_WORKERS = int(os.environ.get("FASTER_WHISPER_NUM_WORKERS", "1"))
+FASTER_WHISPER_BATCHED = os.environ.get("FASTER_WHISPER_BATCHED", "1") == "1"
+# 常駐させる Whisper モデル数（2以上で切替を即時化、メモリとトレードオフ）
+WHISPER_RESIDENT_MODELS = int(os.environ.get("WHISPER_RESIDENT_MODELS", "1"))
+# サーバ側 VAD / 発話終端検出（backend: energy / webrtc）
+VAD_BACKEND = os.environ.get("VAD_BACKEND", "energy")
+VAD_THRESHOLD_DB = float(os.environ.get("VAD_THRESHOLD_DB", "-45"))
+VAD_HANGOVER_MS = int(os.environ.get("VAD_HANGOVER_MS", "600"))
+VAD_MIN_SPEECH_MS = int(os.environ.get("VAD_MIN_SPEECH_MS", "150"))
+VAD_MAX_UTTERANCE_SEC = float(os.environ.get("VAD_MAX_UTTERANCE_SEC", "15"))
+# 発話中の部分認識（partial）の間隔。0 で partial 無し（終端の final のみ）
+ASR_PARTIAL_INTERVAL_MS = int(os.environ.get("ASR_PARTIAL_INTERVAL_MS", "500"))
+# 受信→ASR 間の音声チャンクキュー上限と、満杯時の挙動（merge / block / drop）
+WS_AUDIO_QUEUE_MAX = int(os.environ.get("WS_AUDIO_QUEUE_MAX", "64"))
+WS_AUDIO_QUEUE_MAX_MB = float(os.environ.get("WS_AUDIO_QUEUE_MAX_MB", "4"))  # 未処理音声の合計上限（0=無制限）
+AUDIO_QUEUE_POLICY = os.environ.get("AUDIO_QUEUE_POLICY", "merge")
+# raw PCM16 入力（audio_input で format="pcm16"）のリサンプラ（auto / soxr / polyphase）と
+# キュー満杯時の挙動（PCM はどこからでも読めるので drop で古い音声を捨てて追いつける）
+PCM_RESAMPLER = os.environ.get("PCM_RESAMPLER", "auto")
+PCM_AUDIO_QUEUE_POLICY = os.environ.get("PCM_AUDIO_QUEUE_POLICY", AUDIO_QUEUE_POLICY)
+# 音声の処理遅れがこれを超えたら partial を省略して追いつく（final は必ず出す）
+AUDIO_MAX_LAG_MS = int(os.environ.get("AUDIO_MAX_LAG_MS", "2000"))
+# 受付制御（0 で無制限）: 同時セッション数・同時応答生成数・partial を断る ASR 待ち件数
+MAX_SESSIONS = int(os.environ.get("MAX_SESSIONS", "0"))
+MAX_INFLIGHT_REPLIES = int(os.environ.get("MAX_INFLIGHT_REPLIES", "0"))
+ASR_MAX_PENDING = int(os.environ.get("ASR_MAX_PENDING", "32"))
+# 混雑時に busy フレームでクライアントへ伝える再試行までの目安
+BUSY_RETRY_MS = int(os.environ.get("BUSY_RETRY_MS", "2000"))
+# LLM→TTS 間の文キュー上限
+TTS_SENTENCE_QUEUE_MAX = int(os.environ.get("TTS_SENTENCE_QUEUE_MAX", "8"))
+# 1 なら応答中にユーザが話し始めたら応答を取り消し、クライアントに再生停止を送る
+BARGE_IN = os.environ.get("BARGE_IN", "1") == "1"
+# 0 ならワーカープロセスを使わず従来通り本プロセス内で推論
+MODEL_WORKER_REPLICAS = int(os.environ.get("MODEL_WORKER_REPLICAS", "0"))
+MODEL_WORKER_ROLES = [r.strip() for r in os.environ.get("MODEL_WORKER_ROLES", "asr,tts").split(",") if r.strip()]
+# レプリカあたりの演算スレッド数（0 で cpu_count / レプリカ数）と、推論要求の打ち切り時間
+MODEL_WORKER_THREADS = int(os.environ.get("MODEL_WORKER_THREADS", "0"))
+MODEL_WORKER_TIMEOUT_SEC = float(os.environ.get("MODEL_WORKER_TIMEOUT_SEC", "30"))
 
 # ====== プロンプト読込 ======
 with open(os.path.join("backend", "config", "prompts.yaml"), "r", encoding="utf-8") as f:
     PROMPTS = yaml.safe_load(f)
 MODES = list(PROMPTS["modes"].keys())  # ["雑談","アラート","タイマー","レポート"]
+# 音声コマンド照合器（prompts.yaml の commands から一度だけ構築）
+COMMAND_MATCHER = CommandMatcher.from_config(PROMPTS)
 
 # ====== アプリ初期化 ======
 app = FastAPI(title="Voice Chat Backend")
@@ -36,115 +146,661 @@ app.add_middleware(
     allow_methods=["*"], allow_headers=["*"],
 )
 
+# ====== セッションストア ======
+session_store = create_session_store(
+    SESSION_STORE, SESSION_DB_PATH,
+    flush_interval_sec=SESSION_FLUSH_MS / 1000.0,
+    ttl_sec=SESSION_TTL_SEC,
+)
+
+# ====== 会話ログ ======
+history_writer = create_history_writer(
+    TEXT_HISTORY_BACKEND, TEXT_HISTORY_PATH,
+    flush_interval_sec=TEXT_HISTORY_FLUSH_MS / 1000.0,
+    max_bytes=TEXT_HISTORY_ROTATE_MB * 1024 * 1024,
+    max_age_sec=TEXT_HISTORY_ROTATE_HOURS * 3600,
+    max_pending=TEXT_HISTORY_MAX_PENDING,
+) if TEXT_HISTORY_PATH else None
+
+# ====== LLM応答キャッシュ ======
+response_cache = ResponseCache(
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+    ttl_sec=LLM_CACHE_TTL_SEC,
+    near_duplicate_threshold=LLM_CACHE_NEAR_DUP,
+) if LLM_CACHE_MODES else None
+
 # ====== モデル管理 ======
-tts_manager = TTSManager(model_tag=ESPNET_MODEL_TAG, device=ESPNET_DEVICE)
-whisper_manager = WhisperManager()
+# OpenAI SDK v1（非同期クライアント・コネクションプール共有）
+openai_manager = OpenAIManager(
+    api_key=OPENAI_API_KEY,
+    max_concurrency=OPENAI_MAX_CONCURRENCY,
+    timeout_sec=OPENAI_TIMEOUT_SEC,
+    max_retries=OPENAI_MAX_RETRIES,
+)
+worker_pool = None
+if MODEL_WORKER_REPLICAS > 0:
+    worker_pool = ModelWorkerPool(
+        replicas=MODEL_WORKER_REPLICAS,
+        roles=MODEL_WORKER_ROLES,
+        tts_model_tag=ESPNET_MODEL_TAG,
+        tts_device=ESPNET_DEVICE,
+        tts_audio_format=TTS_AUDIO_FORMAT,
+        threads=MODEL_WORKER_THREADS,
+        request_timeout_sec=MODEL_WORKER_TIMEOUT_SEC,
+    )
+tts_cache = TTSCache(
+    max_bytes=TTS_CACHE_MAX_MB * 1024 * 1024,
+    disk_dir=TTS_CACHE_DIR,
+    disk_max_bytes=TTS_CACHE_DISK_MAX_MB * 1024 * 1024,
+) if TTS_CACHE_MAX_MB > 0 else None
+tts_pool = worker_pool if worker_pool and worker_pool.has_role("tts") else None
+tts_executor = TTSExecutor(
+    workers=TTS_WORKERS or (tts_pool.replicas if tts_pool else 2),
+    max_queue=TTS_QUEUE_MAX,
+)
+tts_manager = TTSManager(
+    model_tag=ESPNET_MODEL_TAG, device=ESPNET_DEVICE,
+    pool=tts_pool,
+    cache=tts_cache,
+    audio_format=TTS_AUDIO_FORMAT,
+    executor=tts_executor,
+    torch_threads=TTS_TORCH_THREADS,
+)
+whisper_manager = WhisperManager(
+    batch_window_ms=WHISPER_BATCH_WINDOW_MS,
+    max_batch_size=WHISPER_MAX_BATCH,
+    pool=worker_pool if worker_pool and worker_pool.has_role("asr") else None,
+    max_resident=WHISPER_RESIDENT_MODELS,
+    max_pending=ASR_MAX_PENDING,
+    engine=ASR_ENGINE,
+    engine_options={
+        "faster_whisper": {
+            "device": FASTER_WHISPER_DEVICE,
+            "compute_type": FASTER_WHISPER_COMPUTE_TYPE,
+            "beam_size": FASTER_WHISPER_BEAM_SIZE,
+            "cpu_threads": FASTER_WHISPER_CPU_THREADS,
+            "num_workers": FASTER_WHISPER_NUM_WORKERS,
+            "batched": FASTER_WHISPER_BATCHED,
+            "language": ASR_LANGUAGE,
+        },
+    },
+)
+# サーバ全体の同時応答生成数（LLM+TTS）。超過分は待たせずに busy で断る
+reply_limiter = InflightLimiter("replies", MAX_INFLIGHT_REPLIES, retry_after_ms=BUSY_RETRY_MS)
+# 全セッションの音声キューで捨てた・結合した・断ったチャンク数（AudioInbox が加算）
+audio_queue_totals: Counter = Counter()
 current_openai_model = DEFAULT_OPENAI_MODEL
+# 起動時ロードの進捗（/api/ready）
+readiness = Readiness(["openai", "tts", "tts_preload", "whisper"] + (["workers"] if worker_pool else []))
+
+async def warm_start():
+    """
+    モデルのロードとウォームアップを並行実行（TTS 系・Whisper・OpenAI 接続を同時に進める）。
+    各コンポーネントの状態と所要時間は /api/ready で確認できる。
+    """
+    async def tts_chain():
+        if worker_pool:
+            # 各レプリカが自プロセス内で ESPnet をロード・ウォームアップし終えるまで待つ
+            if not await readiness.run("workers", worker_pool.wait_ready):
+                readiness.skip("tts", "workers failed")
+                readiness.skip("tts_preload", "workers failed")
+                return
+        # ESPnet2 TTS 起動時ロード（固定）→ ダミー文で初回推論を済ませる（TTS 専用スレッド上で）
+        async def load_tts():
+            await asyncio.to_thread(tts_manager.load)
+            await tts_executor.run(tts_manager.warm_up, priority=PRIORITY_HIGH)
+        if not await readiness.run("tts", load_tts):
+            readiness.skip("tts_preload", "tts failed")
+            return
+        # モード開始の挨拶・定型文を事前合成（モード切替時は合成無しで即応答）
+        await readiness.run("tts_preload", lambda: tts_manager.precompute(preload_phrases()))
+
+    await asyncio.gather(
+        readiness.run("openai", lambda: openai_manager.start(warm_connection=OPENAI_WARM_CONNECTION)),
+        tts_chain(),
+        # Whisper streaming ローカルモデルロード（ウォームアップ込み）
+        readiness.run("whisper", lambda: whisper_manager.load(DEFAULT_WHISPER_MODEL)),
+    )
 
 @app.on_event("startup")
 async def startup():
-    # ESPnet2 TTS 起動時ロード（固定）
-    tts_manager.load()
-    # Whisper streaming ローカルモデルロード
-    await whisper_manager.load(DEFAULT_WHISPER_MODEL)
+    await session_store.start()
+    if history_writer:
+        await history_writer.start()
+    # ワーカープロセス起動（各レプリカが自プロセス内で ESPnet をロード）
+    if worker_pool:
+        worker_pool.start()
+    # モデルはバックグラウンドで並行ロード（待っている間も /api/ready に応答する）
+    app.state.warm_start = asyncio.create_task(warm_start())
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.warm_start.cancel()
+    await session_store.close()
+    # 未書き込みの会話ログを書き切ってから終了
+    if history_writer:
+        await history_writer.close()
+    await openai_manager.aclose()
+    tts_executor.shutdown()
+    if tts_cache:
+        tts_cache.close()
+    if worker_pool:
+        worker_pool.shutdown()
 
 # ====== セッション管理 ======
-# sessions[ws_id]: { "<mode>": [msgs...], "current_mode": "雑談"/None }
+# sessions[ws_id]: { "<mode>": ConversationHistory, "current_mode": "雑談"/None,
+#                    "token": str, "audio_binary": bool, "audio_seq": int,
+#                    "reply_task": 実行中の応答タスク（LLM/TTS）, "reply_lock": asyncio.Lock,
+#                    "inbox": AudioInbox, "busy_sent": {scope: 最終送信時刻} }
+# モードと履歴は token をキーに session_store へも保存し、再接続時に復元する
 sessions: Dict[int, Dict[str, Any]] = {}
 
-def build_messages(mode: str, history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+def preload_phrases() -> List[str]:
+    """事前合成する固定文言: 各モードの initial_scenario と tts_preload（任意）"""
+    texts = []
+    for conf in PROMPTS["modes"].values():
+        texts.append(conf.get("initial_scenario", ""))
+        texts.extend(conf.get("tts_preload", []) or [])
+    return texts
+
+def trace_id(sid: int) -> Optional[str]:
+    sess = sessions.get(sid)
+    return sess["token"][:12] if sess and sess.get("token") else None
+
+def new_history() -> ConversationHistory:
+    return ConversationHistory(max_tokens=HISTORY_MAX_TOKENS, keep_tokens=HISTORY_KEEP_TOKENS)
+
+def session_state(sid: int) -> Dict[str, Any]:
+    return {
+        "current_mode": sessions[sid]["current_mode"],
+        "modes": {m: sessions[sid][m].to_dict() for m in MODES},
+    }
+
+def restore_session(sid: int, state: Dict[str, Any]):
+    mode = state.get("current_mode")
+    sessions[sid]["current_mode"] = mode if mode in MODES else None
+    for m, data in state.get("modes", {}).items():
+        if m in MODES:
+            sessions[sid][m].restore(data)
+
+def persist_session(sid: int):
+    session_store.save(sessions[sid]["token"], session_state(sid))
+
+def build_messages(mode: str, history: ConversationHistory) -> List[Dict[str, str]]:
+    # system + ローリング要約 + 予算内の直近ターン
     sys_prompt = PROMPTS["modes"][mode].get("system", "")
-    return [{"role": "system", "content": sys_prompt}] + history
+    return history.messages(sys_prompt)
+
+async def summarize_history(summary: str, turns: List[Dict[str, str]]) -> str:
+    """古いターンを既存の要約へ差分で畳み込む（要約済み部分は再送しない）"""
+    instruction = PROMPTS.get("rolling_summary_prompt", "")
+    transcript = "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+    messages = [
+        {"role": "system", "content": instruction},
+        {"role": "user", "content": f"これまでの要約:\n{summary or '（なし）'}\n\n新しい会話:\n{transcript}"},
+    ]
+    return await openai_manager.complete(HISTORY_SUMMARY_MODEL or current_openai_model, messages, temperature=0.2)
 
 def detect_voice_command(text: str):
     """
-    音声コマンド検出（単純一致）
-    - モード切替: 「雑談モード / アラートモード / タイマーモード / レポートモード」
-    - 終了: 「会話終了」「チャットを終了して」
-    - 戻る: 「選択画面に戻って」「モード選択に戻って」
-    """
-    mapping = {
-        "雑談モード": {"type": "switch_mode", "mode": "雑談"},
-        "アラートモード": {"type": "switch_mode", "mode": "アラート"},
-        "タイマーモード": {"type": "switch_mode", "mode": "タイマー"},
-        "レポートモード": {"type": "switch_mode", "mode": "レポート"},
-        "会話終了": {"type": "end_chat"},
-        "チャットを終了して": {"type": "end_chat"},
-        "選択画面に戻って": {"type": "go_home"},
-        "モード選択に戻って": {"type": "go_home"},
-    }
-    for k, v in mapping.items():
-        if k in text:
-            return v
-    return None
+    音声コマンド検出（prompts.yaml の commands をコンパイルしたオートマトンで1パス照合）
+    - かな正規化で表記揺れを吸収。partial にも適用し、出現した時点で実行する
+    """
+    return COMMAND_MATCHER.search(text)
+
+async def send_with_audio(ws: WebSocket, sid: int, frame: Dict[str, Any], audio: Optional[bytes] = None):
+    """
+    音声付きフレームを送信。
+    - audio_binary 有効時: JSONヘッダ（audio_id 付き）の後に、先頭4バイト(BE)に audio_id を
+      付けたバイナリフレームで音声本体を送る（Base64/JSON 化のコスト無し）
+    - 無効時: 従来通り Base64 を "audio" に埋め込む
+    """
+    frame = {**frame, "format": tts_manager.audio_format, "mime": tts_manager.mime_type}
+    tid = trace_id(sid)
+    if audio is None:
+        with metrics.timed("ws_send", tid):
+            await ws.send_json({**frame, "audio": None})
+        return
+    sess = sessions[sid]
+    if not sess.get("audio_binary"):
+        with metrics.timed("b64_encode", tid):
+            audio_b64 = base64.b64encode(audio).decode("utf-8")
+        with metrics.timed("ws_send", tid):
+            await ws.send_json({**frame, "audio": audio_b64})
+        return
+    audio_id = sess["audio_seq"] = (sess.get("audio_seq", 0) + 1) & 0xFFFFFFFF
+    # 間に他タスクのフレームが入ってもクライアントは audio_id でヘッダと本体を対応付ける
+    with metrics.timed("ws_send", tid):
+        await ws.send_json({**frame, "audio": None, "audio_id": audio_id, "audio_bytes": len(audio)})
+        await ws.send_bytes(struct.pack(">I", audio_id) + audio)
 
 async def send_mode_start(ws: WebSocket, sid: int, mode: str):
     conf = PROMPTS["modes"].get(mode, {})
     text = conf.get("initial_scenario", "")
-    sessions[sid][mode].append({"role": "assistant", "content": text})
-    audio_b64 = await tts_manager.synthesize_to_b64(text)
-    await ws.send_json({
+    sessions[sid][mode].append("assistant", text)
+    persist_session(sid)
+    try:
+        audio = await tts_manager.synthesize_cached(text)
+    except TTSBusyError:
+        # 混雑時はテキストのみで応答（縮退）
+        audio = None
+    await send_with_audio(ws, sid, {
         "type": "mode_changed",
         "mode": mode,
         "text": text,
-        "audio": audio_b64
+    }, audio)
+
+async def respond_streaming(
+    ws: WebSocket, sid: int, mode: str, messages: List[Dict[str, str]],
+    tts_priority: Optional[int] = None, parts: Optional[List[str]] = None,
+) -> Tuple[str, List[Tuple[str, Optional[bytes]]]]:
+    """
+    LLM 応答のトークン差分を chat_delta フレームで逐次送信しつつ、文単位に区切って
+    完成した文から順に TTS へ回し chat_audio フレームで送信する。
+    TTS は1タスクで順番に処理するため、音声フレームの順序は文の順序と一致する。
+    TTS が混雑（TTSBusyError）の文は音声無しで送る（tts_busy=True）。
+    戻り値は (応答全文, [(文, 音声), ...])。parts を渡すと受信済みの差分をそこへ積む（取り消し時の途中経過用）。
+    """
+    tts_q: asyncio.Queue = asyncio.Queue(maxsize=TTS_SENTENCE_QUEUE_MAX)
+    segments: List[Tuple[str, Optional[bytes]]] = []
+
+    async def tts_worker():
+        seq = 0
+        while True:
+            sentence = await tts_q.get()
+            if sentence is None:
+                return
+            busy = False
+            try:
+                with metrics.timed("tts_total", trace_id(sid)):
+                    audio = await tts_manager.synthesize_cached(sentence, priority=tts_priority)
+            except TTSBusyError:
+                audio, busy = None, True
+            except Exception:
+                audio = None
+            await send_with_audio(ws, sid, {
+                "type": "chat_audio",
+                "mode": mode,
+                "seq": seq,
+                "text": sentence,
+                "tts_busy": busy,
+            }, audio)
+            segments.append((sentence, audio))
+            seq += 1
+
+    worker = asyncio.create_task(tts_worker())
+    splitter = SentenceSplitter()
+    parts = [] if parts is None else parts
+    t0 = time.perf_counter()
+    try:
+        async for delta in openai_manager.stream(current_openai_model, messages):
+            if not parts:
+                metrics.observe("openai_first_token", time.perf_counter() - t0, trace_id(sid))
+            parts.append(delta)
+            await ws.send_json({"type": "chat_delta", "mode": mode, "text": delta})
+            for sentence in splitter.feed(delta):
+                await tts_q.put(sentence)
+        for sentence in splitter.flush():
+            await tts_q.put(sentence)
+        metrics.observe("openai_total", time.perf_counter() - t0, trace_id(sid))
+        await tts_q.put(None)
+        await worker
+    except BaseException:
+        # 例外・取り消し（barge-in）時は合成待ちの文も破棄
+        worker.cancel()
+        raise
+    return "".join(parts), segments
+
+def response_cache_context(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    # キャッシュキーに使う直近の文脈（system/要約は除く）
+    return [m for m in messages if m["role"] != "system"][-LLM_CACHE_CONTEXT_TURNS:]
+
+async def replay_cached_response(ws: WebSocket, sid: int, mode: str, entry: Dict[str, Any]) -> str:
+    """キャッシュ済みの応答を LLM/TTS 無しで送信（フレーム形式は respond_streaming と同じ）"""
+    for seq, (sentence, audio) in enumerate(entry["segments"]):
+        await send_with_audio(ws, sid, {
+            "type": "chat_audio",
+            "mode": mode,
+            "seq": seq,
+            "text": sentence,
+            "tts_busy": False,
+        }, audio)
+    return entry["text"]
+
+async def handle_user_speech(ws: WebSocket, sid: int, text: str):
+    """確定した発話テキスト: 音声コマンドなら実行、それ以外は transcript として送信"""
+    cmd = detect_voice_command(text)
+    if cmd:
+        await start_reply(ws, sid, run_voice_command(ws, sid, cmd))
+        return
+
+    # 普通の逐次テキスト（UI表示用）。発話終端で確定したもの
+    await ws.send_json({"type": "transcript", "status": "final", "text": text, "final": True})
+
+async def run_voice_command(ws: WebSocket, sid: int, cmd: Dict[str, Any]):
+    if cmd["type"] == "switch_mode":
+        mode = cmd["mode"]
+        sessions[sid]["current_mode"] = mode
+        await send_mode_start(ws, sid, mode)
+    elif cmd["type"] == "end_chat":
+        cur = sessions[sid]["current_mode"]
+        if cur:
+            sessions[sid][cur].clear()
+        sessions[sid]["current_mode"] = None
+        await ws.send_json({"type": "chat_ended", "text": "会話を終了しました"})
+    elif cmd["type"] == "go_home":
+        sessions[sid]["current_mode"] = None
+        await ws.send_json({"type": "go_home"})
+    persist_session(sid)
+
+async def run_chat_turn(ws: WebSocket, sid: int, cur: str, user_text: str):
+    """1ターン分の応答（LLM → 文単位 TTS → 送信）。reply タスクとして動き、barge-in で取り消される"""
+    turn_t0 = time.perf_counter()
+    sessions[sid][cur].append("user", user_text)
+
+    messages = build_messages(cur, sessions[sid][cur])
+
+    # レポートモードで「サマリ」指示があればサマリ用プロンプトを追加
+    # （古いターンはローリング要約として含まれるため全文は再送しない）
+    tts_priority = None
+    if cur == "レポート" and ("サマリ" in user_text or "サマリー" in user_text):
+        summary_prompt = PROMPTS["modes"][cur].get("summary_prompt", "")
+        messages.append({"role": "user", "content": summary_prompt})
+        # 長文サマリは挨拶・通常応答より後回し
+        tts_priority = PRIORITY_LOW
+
+    # 応答キャッシュ（対象モードのみ）: ヒットすれば LLM も TTS も実行しない
+    cache_args = None
+    cached = None
+    if response_cache is not None and cur in LLM_CACHE_MODES and tts_priority is None:
+        cache_args = (
+            current_openai_model, cur,
+            PROMPTS["modes"][cur].get("system", ""),
+            response_cache_context(messages),
+        )
+        cached = response_cache.get(*cache_args)
+
+    # OpenAI（ストリーミング）→ 文単位で TTS → chat_audio を逐次送信
+    parts: List[str] = []
+    try:
+        if cached:
+            ai_text = await replay_cached_response(ws, sid, cur, cached)
+        else:
+            ai_text, segments = await respond_streaming(
+                ws, sid, cur, messages, tts_priority=tts_priority, parts=parts
+            )
+            # 全文の音声が揃った応答だけキャッシュ
+            if cache_args and ai_text and all(a is not None for _, a in segments):
+                response_cache.put(*cache_args, {"text": ai_text, "segments": segments})
+    except asyncio.CancelledError:
+        # barge-in: 途中まで生成した応答を履歴に残す（user/assistant の交互を保つ）
+        partial = "".join(parts)
+        sessions[sid]["reply_partial"] = partial
+        sessions[sid][cur].append("assistant", partial)
+        if history_writer:
+            token = sessions[sid]["token"]
+            history_writer.write("user", user_text, session=token, mode=cur)
+            history_writer.write("assistant", partial, session=token, mode=cur, interrupted=True)
+        persist_session(sid)
+        raise
+    except Exception as e:
+        await ws.send_json({"type": "error", "text": f"OpenAI error: {e}"})
+        return
+
+    sessions[sid][cur].append("assistant", ai_text)
+    if history_writer:
+        token = sessions[sid]["token"]
+        history_writer.write("user", user_text, session=token, mode=cur)
+        history_writer.write("assistant", ai_text, session=token, mode=cur)
+    # 予算超過なら古いターンをバックグラウンドで要約へ畳み込み
+    sessions[sid][cur].maybe_fold(summarize_history)
+    persist_session(sid)
+
+    # 全文（音声は chat_audio で送信済み）
+    await ws.send_json({
+        "type": "chat_response",
+        "mode": cur,
+        "text": ai_text,
+        "audio": None,
+        "streamed": True,
+        "cached": bool(cached),
     })
+    metrics.observe("turn_total", time.perf_counter() - turn_t0, trace_id(sid))
 
-async def call_openai(messages: List[Dict[str, str]]) -> str:
-    # OpenAI Chat（v1 client）
-    completion = openai_client.chat.completions.create(
-        model=current_openai_model,
-        messages=messages,
-        temperature=0.7,
+async def cancel_reply(ws: WebSocket, sid: int, reason: str):
+    """
+    実行中の応答タスク（LLM/TTS）を取り消し、クライアントに再生停止（stop_audio）を送る。
+    サーバ側で送信済みでもクライアントがまだ再生中の場合があるため、停止通知は常に送る。
+    """
+    sess = sessions[sid]
+    task = sess.get("reply_task")
+    partial = None
+    if task is not None and not task.done():
+        with metrics.timed("reply_cancel", trace_id(sid)):
+            task.cancel()
+            await asyncio.wait([task])
+        partial = sess.pop("reply_partial", None)
+    sess["reply_task"] = None
+    await ws.send_json({"type": "stop_audio", "reason": reason, "text": partial})
+
+async def send_busy(ws: WebSocket, sid: Optional[int], scope: str, retry_after_ms: int, text: Optional[str] = None):
+    """混雑の通知。scope ごとに retry_after_ms の間は重複して送らない"""
+    if sid is not None:
+        last = sessions[sid].setdefault("busy_sent", {})
+        now = time.monotonic()
+        if now - last.get(scope, -1e9) < retry_after_ms / 1000.0:
+            return
+        last[scope] = now
+    await ws.send_json({"type": "busy", "scope": scope, "retry_after_ms": retry_after_ms, "text": text})
+
+async def start_reply(ws: WebSocket, sid: int, coro, limiter: Optional[InflightLimiter] = None):
+    """
+    応答処理を reply タスクとして開始（受信・ASR は止めない）。実行中の応答は先に取り消す。
+    limiter 指定時はサーバ全体の同時実行枠を取り、満杯なら実行せず busy を返す。
+    ASR タスクと受信ループの両方から呼ばれるため、セッションごとの reply_lock で1件ずつ処理する
+    （重なると両方の応答が走り、片方が reply_task から外れて取り消せなくなる）。
+    """
+    try:
+        async with sessions[sid]["reply_lock"]:
+            await cancel_reply(ws, sid, "new_reply")
+            if sid not in sessions:  # 待っている間に切断された
+                coro.close()
+                return
+            if limiter is not None:
+                try:
+                    limiter.acquire()
+                except ServerBusyError as e:
+                    coro.close()
+                    await send_busy(ws, None, e.scope, e.retry_after_ms,
+                                    "ただいま混み合っています。少し待ってからもう一度お試しください。")
+                    return
+            _spawn_reply(ws, sid, coro, limiter)
+    except asyncio.CancelledError:
+        coro.close()  # 呼び出し元（ASR タスク）ごと取り消された。起動済みなら no-op
+        raise
+
+def _spawn_reply(ws: WebSocket, sid: int, coro, limiter: Optional[InflightLimiter]):
+    """reply タスクを起動して reply_task に登録（start_reply から reply_lock を持った状態で呼ぶ）"""
+
+    async def guarded():
+        try:
+            await coro
+        except (asyncio.CancelledError, WebSocketDisconnect):
+            raise
+        except Exception as e:
+            await ws.send_json({"type": "error", "text": f"reply error: {e}"})
+
+    def done(_task: asyncio.Task):
+        # 開始前に取り消されると guarded の本体は実行されないため、後始末は完了コールバックで行う
+        coro.close()
+        if limiter is not None:
+            limiter.release()
+
+    task = asyncio.create_task(guarded())
+    task.add_done_callback(done)
+    sessions[sid]["reply_task"] = task
+
+def create_endpointer() -> Endpointer:
+    return Endpointer(
+        threshold_db=VAD_THRESHOLD_DB,
+        hangover_ms=VAD_HANGOVER_MS,
+        min_speech_ms=VAD_MIN_SPEECH_MS,
+        max_utterance_sec=VAD_MAX_UTTERANCE_SEC,
+        backend=VAD_BACKEND,
     )
-    return completion.choices[0].message.content
+
+async def asr_loop(ws: WebSocket, sid: int, inbox: AudioInbox, endpointer: Endpointer,
+                   stream: StreamingTranscript):
+    """
+    受信キューの音声チャンクを デコード（sessions[sid]["decoder"]）→ VAD → ASR。応答生成とは別タスクなので、
+    応答中も取り込みは止まらない。発話が認識された時点で応答を取り消す（barge-in）。
+    処理が遅れている間は溜まったチャンクをまとめて処理し、partial を省略して追いつく。
+    """
+    barged = False  # この発話で barge-in 済みか
+    while True:
+        chunk, t_enq = await inbox.get()
+        lag = time.perf_counter() - t_enq
+        metrics.observe("audio_queue_wait", lag, trace_id(sid))
+
+        # 常駐デコーダ → VAD/発話区間検出（無音はここで捨てる）
+        try:
+            decoder = sessions[sid]["decoder"]
+            await decoder.feed(chunk)
+            audio = decoder.read()
+            with metrics.timed("vad", trace_id(sid)):
+                utterances = endpointer.process(audio)
+        except Exception as e:
+            await ws.send_json({"type": "error", "text": f"ASR error: {e}"})
+            continue
+
+        # 発話終端: 未確定の末尾だけ認識して final
+        for utterance in utterances:
+            try:
+                with metrics.timed("asr_final", trace_id(sid)):
+                    text = await stream.finalize(utterance)
+            except Exception as e:
+                await ws.send_json({"type": "error", "text": f"ASR error: {e}"})
+                text = ""
+            if text:
+                if BARGE_IN and not barged:
+                    await cancel_reply(ws, sid, "barge_in")
+                await handle_user_speech(ws, sid, text)
+            barged = False
+
+        # 遅れが大きいときは partial を出さずに次のチャンクへ（クライアントには busy を通知）
+        if lag * 1000 > AUDIO_MAX_LAG_MS:
+            await send_busy(ws, sid, "audio", BUSY_RETRY_MS)
+            continue
+
+        # 発話中: 一定量音声が増えるごとに partial（確定済み部分は再認識しない）
+        current = endpointer.current()
+        if ASR_PARTIAL_INTERVAL_MS > 0 and len(current) and stream.due(len(current)):
+            try:
+                with metrics.timed("asr_partial", trace_id(sid)):
+                    committed, text = await stream.update(current)
+            except ASRBusyError:
+                # ASR 混雑: partial は省略（final は発話終端で必ず出す）
+                await send_busy(ws, sid, "asr", BUSY_RETRY_MS)
+                continue
+            except Exception as e:
+                await ws.send_json({"type": "error", "text": f"ASR error: {e}"})
+                continue
+            # partial にコマンドが現れた時点で実行し、この発話は破棄（final/応答を出さない）
+            cmd = detect_voice_command(text)
+            if cmd:
+                endpointer.discard()
+                stream.reset()
+                barged = False
+                await start_reply(ws, sid, run_voice_command(ws, sid, cmd))
+                continue
+            if text:
+                if BARGE_IN and not barged:
+                    barged = True
+                    await cancel_reply(ws, sid, "barge_in")
+                await ws.send_json({
+                    "type": "transcript",
+                    "status": "partial",
+                    "text": text,
+                    "committed": committed,
+                    "final": False,
+                })
 
 # ====== WebSocket ======
 @app.websocket("/ws")
 async def ws_endpoint(ws: WebSocket):
+    """
+    セッションごとに 受信（このループ）→ ASR タスク → 応答（LLM/TTS）タスク を並行に動かす。
+    受信ループは音声をキューに積むだけなので、応答生成中も音声の取り込みが遅れない。
+    """
     await ws.accept()
+    # 起動直後はモデルのロード完了（成功・失敗とも）まで待ってから受け付ける
+    await readiness.done.wait()
+    # 同時セッション数の上限: 超過時は busy を送って閉じる（1013 = Try Again Later）
+    if MAX_SESSIONS > 0 and len(sessions) >= MAX_SESSIONS:
+        await send_busy(ws, None, "sessions", BUSY_RETRY_MS,
+                        "接続数が上限に達しています。しばらくしてから再接続します。")
+        await ws.close(code=1013)
+        return
     sid = id(ws)
-    sessions[sid] = {m: [] for m in MODES}
+    sessions[sid] = {m: new_history() for m in MODES}
     sessions[sid]["current_mode"] = None
+    # 再接続時は ?session=<token> で前回のモード・履歴を復元
+    token = ws.query_params.get("session")
+    state = await session_store.load(token) if token else None
+    if state:
+        restore_session(sid, state)
+    else:
+        token = uuid.uuid4().hex
+    sessions[sid]["token"] = token
+    sessions[sid]["audio_binary"] = False
+    sessions[sid]["audio_seq"] = 0
+    sessions[sid]["reply_task"] = None
+    sessions[sid]["reply_lock"] = asyncio.Lock()
+    sessions[sid]["audio_received"] = False
+    # 接続ごとの常駐 ffmpeg デコーダ（webm/opus → 16kHz PCM）。audio_input で PCM16 に切替可
+    sessions[sid]["decoder"] = whisper_manager.create_decoder()
+    # 接続ごとの VAD + 発話区間検出
+    endpointer = create_endpointer()
+    # 接続ごとのストリーミングASR状態（他セッションと音声・仮説を共有しない）
+    stream = StreamingTranscript(whisper_manager, partial_interval_ms=max(1, ASR_PARTIAL_INTERVAL_MS),
+                                 language=ASR_LANGUAGE)
+    # 受信 → ASR の音声キュー（上限付き、溢れたときは AUDIO_QUEUE_POLICY に従う）
+    inbox = AudioInbox(
+        max_chunks=WS_AUDIO_QUEUE_MAX,
+        policy=AUDIO_QUEUE_POLICY,
+        max_bytes=int(WS_AUDIO_QUEUE_MAX_MB * 1024 * 1024),
+        retry_after_ms=BUSY_RETRY_MS,
+        totals=audio_queue_totals,
+    )
+    sessions[sid]["inbox"] = inbox
+    asr_task = asyncio.create_task(asr_loop(ws, sid, inbox, endpointer, stream))
 
     try:
+        await ws.send_json({
+            "type": "session",
+            "token": token,
+            "resumed": bool(state),
+            "mode": sessions[sid]["current_mode"],
+        })
+
         while True:
             msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                break
 
-            # ---- 音声バイナリ ----
+            # ---- 音声バイナリ: ASR タスクへ渡すだけ ----
             if "bytes" in msg and msg["bytes"] is not None:
-                chunk = msg["bytes"]
-
-                # Whisper でASR
+                if asr_task.done():
+                    break
+                sessions[sid]["audio_received"] = True
                 try:
-                    text = await whisper_manager.transcribe_bytes(chunk)
-                except Exception as e:
-                    await ws.send_json({"type": "error", "text": f"ASR error: {e}"})
-                    continue
-
-                if not text:
-                    continue
-
-                # 音声コマンド判定
-                cmd = detect_voice_command(text)
-                if cmd:
-                    if cmd["type"] == "switch_mode":
-                        mode = cmd["mode"]
-                        sessions[sid]["current_mode"] = mode
-                        await send_mode_start(ws, sid, mode)
-                    elif cmd["type"] == "end_chat":
-                        cur = sessions[sid]["current_mode"]
-                        if cur:
-                            sessions[sid][cur] = []
-                        sessions[sid]["current_mode"] = None
-                        await ws.send_json({"type": "chat_ended", "text": "会話を終了しました"})
-                    elif cmd["type"] == "go_home":
-                        sessions[sid]["current_mode"] = None
-                        await ws.send_json({"type": "go_home"})
-                    continue
-
-                # 普通の逐次テキスト（UI表示用）
-                await ws.send_json({"type": "transcript", "text": text})
+                    await inbox.put(msg["bytes"])
+                except ServerBusyError as e:
+                    # 結合しても溜まり続ける（ASR が追いつかない）: 途中は捨てられないので張り直してもらう
+                    await send_busy(ws, None, e.scope, e.retry_after_ms,
+                                    "音声の処理が追いつかないため再接続します。")
+                    await ws.close(code=1013)
+                    break
                 continue
 
             # ---- テキスト（JSON想定）----
@@ -158,11 +814,53 @@ async def ws_endpoint(ws: WebSocket):
 
                 typ = data.get("type")
 
+                if typ == "audio_output":
+                    # 音声をバイナリフレームで受け取るか（既定は Base64 埋め込み）
+                    sessions[sid]["audio_binary"] = bool(data.get("binary"))
+                    await ws.send_json({
+                        "type": "audio_output",
+                        "binary": sessions[sid]["audio_binary"],
+                        "format": tts_manager.audio_format,
+                        "mime": tts_manager.mime_type,
+                    })
+                    continue
+
+                if typ == "audio_input":
+                    # 入力音声の形式（最初の音声フレームより前に送る）。既定は webm/opus（ffmpeg でデコード）
+                    # pcm16: s16le を sample_rate / channels のまま送り、サーバ内で 16kHz mono に変換する
+                    if sessions[sid]["audio_received"]:
+                        await ws.send_json({"type": "error", "text": "audio_input は音声の送信前に送ってください"})
+                        continue
+                    fmt = data.get("format", "webm")
+                    reply = {"type": "audio_input", "format": fmt}
+                    try:
+                        if fmt == "pcm16":
+                            decoder = whisper_manager.create_pcm_decoder(
+                                int(data.get("sample_rate", 0)),
+                                channels=int(data.get("channels", 1)),
+                                resampler=PCM_RESAMPLER,
+                            )
+                            inbox.set_policy(PCM_AUDIO_QUEUE_POLICY)
+                            reply.update(sample_rate=decoder.input_rate, channels=decoder.channels,
+                                         resampler=decoder.resampler.name)
+                        elif fmt == "webm":
+                            decoder = whisper_manager.create_decoder()
+                            inbox.set_policy(AUDIO_QUEUE_POLICY)
+                        else:
+                            raise ValueError(f"unknown audio format: {fmt}")
+                    except (TypeError, ValueError, ImportError) as e:
+                        await ws.send_json({"type": "error", "text": f"audio_input error: {e}"})
+                        continue
+                    await sessions[sid]["decoder"].close()
+                    sessions[sid]["decoder"] = decoder
+                    await ws.send_json(reply)
+                    continue
+
                 if typ == "set_mode":
                     mode = data.get("mode")
                     if mode in MODES:
                         sessions[sid]["current_mode"] = mode
-                        await send_mode_start(ws, sid, mode)
+                        await start_reply(ws, sid, send_mode_start(ws, sid, mode))
                     else:
                         await ws.send_json({"type": "error", "text": f"unknown mode: {mode}"})
                     continue
@@ -172,44 +870,25 @@ async def ws_endpoint(ws: WebSocket):
                     if not cur:
                         await ws.send_json({"type": "error", "text": "モードが選択されていません"})
                         continue
-                    user_text = data.get("text", "")
-                    sessions[sid][cur].append({"role": "user", "content": user_text})
-
-                    messages = build_messages(cur, sessions[sid][cur])
-
-                    # レポートモードで「サマリ」指示があればサマリ用プロンプトを追加
-                    if cur == "レポート" and ("サマリ" in user_text or "サマリー" in user_text):
-                        summary_prompt = PROMPTS["modes"][cur].get("summary_prompt", "")
-                        messages.append({"role": "user", "content": summary_prompt})
-
-                    # OpenAI
-                    try:
-                        ai_text = await call_openai(messages)
-                    except Exception as e:
-                        await ws.send_json({"type": "error", "text": f"OpenAI error: {e}"})
-                        continue
-
-                    sessions[sid][cur].append({"role": "assistant", "content": ai_text})
-
-                    # TTS
-                    try:
-                        audio_b64 = await tts_manager.synthesize_to_b64(ai_text)
-                    except Exception as e:
-                        audio_b64 = None
-
-                    await ws.send_json({
-                        "type": "chat_response",
-                        "mode": cur,
-                        "text": ai_text,
-                        "audio": audio_b64
-                    })
+                    await start_reply(ws, sid, run_chat_turn(ws, sid, cur, data.get("text", "")),
+                                      limiter=reply_limiter)
                     continue
 
                 # 未知のタイプ
                 await ws.send_json({"type": "error", "text": f"unknown message type: {typ}"})
 
     except WebSocketDisconnect:
+        pass
+    finally:
+        tasks = [t for t in (asr_task, sessions[sid].get("reply_task")) if t is not None]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await sessions[sid]["decoder"].close()
+        # 切断時は即座に書き出し（別ワーカーへの再接続でも最新状態で再開できるように）
+        persist_session(sid)
         sessions.pop(sid, None)
+        await session_store.flush(token)
 
 @app.post("/api/change_models")
 async def change_models(req: Request):
@@ -217,7 +896,7 @@ async def change_models(req: Request):
     JSON 例:
     {
       "openai_model": "gpt-4o",
-      "whisper_model": "medium"
+      "whisper_model": "medium"          # または "faster:small"（エンジン:モデル）
     }
     """
     global current_openai_model
@@ -229,17 +908,79 @@ async def change_models(req: Request):
         updated["openai_model"] = current_openai_model
 
     if "whisper_model" in body and body["whisper_model"]:
-        await whisper_manager.load(body["whisper_model"])
+        try:
+            parse_model_spec(body["whisper_model"], ASR_ENGINE)
+        except ValueError as e:
+            return JSONResponse({"status": "error", "error": str(e)}, status_code=400)
+        # バックグラウンドでロード→ウォームアップ→差し替え。完了までは旧モデルで処理継続
+        whisper_manager.start_load(body["whisper_model"])
         updated["whisper_model"] = whisper_manager.model_name
+        updated["whisper_loading"] = whisper_manager.status()
 
     return {"status": "ok", **updated}
 
+@app.get("/api/ready")
+async def ready():
+    """readiness probe: 全コンポーネントがロード・ウォームアップ済みなら 200、それ以外は 503"""
+    snap = readiness.snapshot()
+    return JSONResponse(snap, status_code=200 if snap["ready"] else 503)
+
 @app.get("/api/status")
 async def status():
     return {
         "openai_model": current_openai_model,
+        "openai": openai_manager.stats(),
         "whisper_model": whisper_manager.model_name,
+        "whisper_loading": whisper_manager.status(),
+        "whisper_batch": whisper_manager.scheduler.stats(),
+        "workers": worker_pool.stats() if worker_pool else [],
         "espnet_model": ESPNET_MODEL_TAG,
         "espnet_device": ESPNET_DEVICE,
+        "tts_audio_format": TTS_AUDIO_FORMAT,
+        "tts_cache": tts_cache.stats() if tts_cache else None,
+        "tts_executor": tts_executor.stats(),
+        "session_store": session_store.stats(),
+        "text_history": history_writer.stats() if history_writer else None,
+        "llm_cache": response_cache.stats() if response_cache else None,
+        "admission": {
+            "sessions": len(sessions),
+            "max_sessions": MAX_SESSIONS,
+            "replies": reply_limiter.stats(),
+            "asr_rejected": whisper_manager.scheduler.stats()["rejected"],
+            "audio_queue_policy": AUDIO_QUEUE_POLICY,
+            "pcm_audio_queue_policy": PCM_AUDIO_QUEUE_POLICY,
+            "audio_queue": {k: audio_queue_totals[k] for k in ("dropped", "merged", "refused")},
+        },
         "modes": MODES
-    }
\ No newline at end of file
+    }
+
+# ====== メトリクス ======
+metrics.registry.gauge("voicechat_active_sessions", "Connected /ws sessions", lambda: len(sessions))
+metrics.registry.gauge("voicechat_asr_queue_depth", "ASR windows waiting for a batch",
+                       lambda: whisper_manager.scheduler.stats()["pending"])
+metrics.registry.gauge("voicechat_tts_queue_depth", "TTS jobs waiting in the executor",
+                       lambda: tts_executor.stats()["queued"])
+metrics.registry.gauge("voicechat_tts_running", "TTS jobs running", lambda: tts_executor.stats()["running"])
+metrics.registry.gauge("voicechat_openai_in_flight", "OpenAI requests in flight",
+                       lambda: openai_manager.stats()["in_flight"])
+metrics.registry.gauge("voicechat_worker_queue_depth", "Jobs in flight across worker replicas",
+                       lambda: sum(w["queue_depth"] for w in worker_pool.stats()) if worker_pool else 0)
+metrics.registry.gauge("voicechat_replies_in_flight", "Replies (LLM+TTS) being generated",
+                       lambda: reply_limiter.in_flight)
+metrics.registry.gauge("voicechat_audio_backlog_max_sec", "Largest per-session audio backlog",
+                       lambda: max((s["inbox"].lag() for s in sessions.values() if "inbox" in s), default=0.0))
+metrics.registry.gauge("voicechat_audio_chunks_dropped", "Audio chunks dropped by the drop queue policy",
+                       lambda: audio_queue_totals["dropped"])
+metrics.registry.gauge("voicechat_audio_chunks_merged", "Audio queue merges under the merge queue policy",
+                       lambda: audio_queue_totals["merged"])
+metrics.registry.gauge("voicechat_audio_chunks_refused", "Audio chunks refused over the queue byte cap",
+                       lambda: audio_queue_totals["refused"])
+metrics.registry.gauge("voicechat_history_pending", "Conversation log records waiting to be written",
+                       lambda: history_writer.stats()["pending"] if history_writer else 0)
+metrics.registry.gauge("voicechat_history_dropped", "Conversation log records dropped after write failures",
+                       lambda: history_writer.dropped if history_writer else 0)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus テキスト形式（ステージ別ヒストグラム＋p50/p95/p99、キュー深さ等のゲージ）"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,385 @@
+# backend/bench/loadtest.py
+"""
+エンドツーエンド負荷試験・ベンチマーク。
+
+FastAPI アプリを同一プロセス内の uvicorn で起動し、N 本の /ws クライアントから
+webm/opus 音声を実時間ペース（AudioRecorder と同じ chunk_ms 間隔）で送信する。
+確定 transcript を受け取るたびに chat を送り、以下を計測して JSON に保存する。
+  - time_to_first_transcript: 音声送信開始 → 最初の transcript
+  - time_to_first_audio:      chat 送信 → 最初の chat_audio
+  - turn_latency:             chat 送信 → chat_response
+  - CPU 時間（本プロセス＋終了した子プロセス=ffmpeg）とピーク RSS
+
+既定では OpenAI / TTS / ASR をスタブに差し替える（ffmpeg デコード・VAD・スケジューラ・WS ループは実物）。
+--pcm-rate を付けると webm/opus の代わりに raw PCM16（AudioWorklet 送信と同じ）を送り、
+ffmpeg を使わないプロセス内リサンプリング経路を計測する。
+--real を付けると実モデル・実 OpenAI で計測する（環境変数は通常起動と同じ）。
+
+例（リポジトリのルートで実行）:
+  python backend/bench/loadtest.py --clients 8 --seconds 12 --out bench_results/run.json
+  python backend/bench/loadtest.py --clients 8 --compare bench_results/run.json
+  python backend/bench/loadtest.py --clients 8 --pcm-rate 48000 --compare bench_results/run.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(BACKEND_DIR)
+
+
+# ====== スタブ ======
+class StubTranscriber:
+    """音声長 × rtf だけ待ってから固定文を返す"""
+    def __init__(self, rtf: float, text: str):
+        self.rtf = rtf
+        self.text = text
+
+    def transcribe(self, audio):
+        time.sleep(len(audio) / 16000 * self.rtf)
+        return {"text": self.text, "segments": []}
+
+
+class StubOpenAI:
+    """トークンを一定間隔で返すストリーム"""
+    def __init__(self, first_token_sec: float, token_sec: float, reply: str):
+        self.first_token_sec = first_token_sec
+        self.token_sec = token_sec
+        self.reply = reply
+        self.in_flight = 0
+
+    async def stream(self, model, messages, temperature=0.7):
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self.first_token_sec)
+            for i in range(0, len(self.reply), 2):
+                yield self.reply[i:i + 2]
+                await asyncio.sleep(self.token_sec)
+        finally:
+            self.in_flight -= 1
+
+    async def complete(self, model, messages, temperature=0.7):
+        await asyncio.sleep(self.first_token_sec)
+        return self.reply
+
+    async def start(self, warm_connection=True):
+        return None
+
+    def stats(self):
+        return {"in_flight": self.in_flight, "max_concurrency": None, "retries": 0}
+
+    async def aclose(self):
+        pass
+
+
+def stub_wav(seconds: float, sample_rate: int = 22050) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(b"\0\0" * int(seconds * sample_rate))
+    return buf.getvalue()
+
+
+def install_stubs(app_module, args):
+    app_module.openai_manager = StubOpenAI(args.llm_first_token, args.llm_token_interval, args.reply)
+
+    tts = app_module.tts_manager
+    tts.load = lambda: None
+
+    def synthesize_bytes(text, sample_rate=22050, fmt=None):
+        # 文字数に比例した合成時間を模擬（CPU は使わない）
+        time.sleep(len(text) * args.tts_sec_per_char)
+        return stub_wav(len(text) * 0.12)
+
+    tts.synthesize_bytes = synthesize_bytes
+    tts.audio_format, tts.mime_type = "wav", "audio/wav"
+
+    wm = app_module.whisper_manager
+
+    async def load(model_name="stub"):
+        wm.transcriber = StubTranscriber(args.asr_rtf, args.transcript)
+        wm.model_name = model_name
+
+    wm.load = load
+
+
+# ====== 音声 ======
+def make_test_audio(path: str, seconds: float):
+    """2秒発話相当のトーン＋1秒無音を繰り返す webm/opus を生成"""
+    expr = "0.3*sin(2*PI*220*t)*lt(mod(t\\,3)\\,2)"
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi",
+         "-i", f"aevalsrc={expr}:s=48000:d={seconds}",
+         "-c:a", "libopus", "-b:a", "32k", "-f", "webm", path],
+        check=True,
+    )
+
+
+def make_test_pcm(seconds: float, sample_rate: int) -> bytes:
+    """make_test_audio と同じトーン/無音パターンの PCM16（s16le, mono）"""
+    import numpy as np
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    x = 0.3 * np.sin(2 * np.pi * 220 * t) * (np.mod(t, 3) < 2)
+    return (x * 32767).astype("<i2").tobytes()
+
+
+def decode_pcm(path: str, sample_rate: int) -> bytes:
+    return subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-i", path,
+         "-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-ac", "1", "pipe:1"],
+        check=True, capture_output=True,
+    ).stdout
+
+
+def split_pcm(data: bytes, sample_rate: int, chunk_ms: int) -> List[bytes]:
+    size = sample_rate * chunk_ms // 1000 * 2
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def probe_duration(path: str) -> float:
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+        check=True, capture_output=True, text=True,
+    ).stdout.strip()
+    return float(out)
+
+
+def split_chunks(data: bytes, duration_sec: float, chunk_ms: int) -> List[bytes]:
+    # MediaRecorder と同様、先頭チャンクだけがコンテナヘッダを含むバイト列の分割
+    n = max(1, int(duration_sec * 1000 / chunk_ms))
+    size = -(-len(data) // n)
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+# ====== クライアント ======
+async def run_client(url: str, chunks: List[bytes], chunk_ms: int, mode: str, max_turns: int,
+                     pcm_rate: int = 0) -> Dict:
+    import websockets
+
+    res = {"ttft": None, "tfa": [], "turns": [], "cancelled": 0, "errors": 0}
+    open_turn = [False]  # chat 送信後、chat_response / stop_audio をまだ受け取っていない
+    turn_started: List[float] = []
+    got_audio = set()
+
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps({"type": "audio_output", "binary": True}))
+        if pcm_rate:
+            await ws.send(json.dumps({"type": "audio_input", "format": "pcm16", "sample_rate": pcm_rate}))
+        await ws.send(json.dumps({"type": "set_mode", "mode": mode}))
+        t_stream = time.perf_counter()
+
+        async def receiver():
+            async for raw in ws:
+                now = time.perf_counter()
+                if isinstance(raw, bytes):
+                    continue
+                msg = json.loads(raw)
+                typ = msg.get("type")
+                if typ == "transcript":
+                    if res["ttft"] is None:
+                        res["ttft"] = now - t_stream
+                    if msg.get("final") and len(turn_started) < max_turns:
+                        turn_started.append(time.perf_counter())
+                        open_turn[0] = True
+                        await ws.send(json.dumps({"type": "chat", "text": msg["text"]}))
+                elif typ == "chat_audio" and turn_started and len(turn_started) not in got_audio:
+                    if msg.get("audio") or msg.get("audio_id"):
+                        got_audio.add(len(turn_started))
+                        res["tfa"].append(now - turn_started[-1])
+                elif typ == "chat_response" and turn_started:
+                    res["turns"].append(now - turn_started[-1])
+                    open_turn[0] = False
+                elif typ == "stop_audio" and msg.get("reason") == "barge_in" and open_turn[0]:
+                    # barge-in で取り消されたターン
+                    res["cancelled"] += 1
+                    open_turn[0] = False
+                elif typ == "error":
+                    res["errors"] += 1
+
+        recv = asyncio.create_task(receiver())
+        # 実時間ペースで送信（累積ずれを避けるため絶対時刻で待つ）
+        for i, chunk in enumerate(chunks):
+            await ws.send(chunk)
+            await asyncio.sleep(max(0.0, t_stream + (i + 1) * chunk_ms / 1000 - time.perf_counter()))
+        # 最後のターンの応答を待つ
+        deadline = time.perf_counter() + 10.0
+        while open_turn[0] and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        recv.cancel()
+    return res
+
+
+# ====== 集計 ======
+def summarize(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    v = sorted(values)
+    pick = lambda q: v[min(len(v) - 1, int(q * len(v)))]
+    return {
+        "count": len(v), "mean": statistics.fmean(v),
+        "p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": v[-1],
+    }
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(current: Dict, baseline_path: str):
+    with open(baseline_path, encoding="utf-8") as f:
+        base = json.load(f)
+    print(f"\n--- compare with {baseline_path} ({base.get('git_rev')}) ---")
+    for key in ("time_to_first_transcript", "time_to_first_audio", "turn_latency"):
+        a, b = base.get(key), current.get(key)
+        if not a or not b:
+            continue
+        for q in ("p50", "p95", "p99"):
+            delta = (b[q] - a[q]) / a[q] * 100 if a[q] else 0.0
+            print(f"{key:26s} {q}: {a[q]:.3f}s -> {b[q]:.3f}s ({delta:+.1f}%)")
+    for key in ("cpu_sec", "peak_rss_mb"):
+        print(f"{key:26s}    : {base.get(key)} -> {current.get(key)}")
+
+
+async def main(args):
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(REPO_ROOT)  # app.py は prompts.yaml をリポジトリルートからの相対パスで読む
+    os.environ.setdefault("OPENAI_API_KEY", "bench-dummy")
+    if not args.real:
+        os.environ["MODEL_WORKER_REPLICAS"] = "0"
+    if not args.barge_in:
+        # 合成音声は2秒ごとに発話が来るため、barge-in 有効だと応答が毎回取り消されてターンを計測できない
+        os.environ["BARGE_IN"] = "0"
+    import uvicorn
+    import app as app_module
+
+    if not args.real:
+        install_stubs(app_module, args)
+
+    # 音声の用意
+    tmpdir = tempfile.mkdtemp(prefix="voicechat-bench-")
+    audio_path = args.audio
+    if args.pcm_rate:
+        pcm = decode_pcm(audio_path, args.pcm_rate) if audio_path else make_test_pcm(args.seconds, args.pcm_rate)
+        chunks = split_pcm(pcm, args.pcm_rate, args.chunk_ms)
+    else:
+        if not audio_path:
+            audio_path = os.path.join(tmpdir, "speech.webm")
+            make_test_audio(audio_path, args.seconds)
+        with open(audio_path, "rb") as f:
+            chunks = split_chunks(f.read(), probe_duration(audio_path), args.chunk_ms)
+
+    # サーバ起動（同一プロセス）
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app_module.app, host="127.0.0.1", port=port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    peak = [rss_mb()]
+
+    async def sample_rss():
+        while True:
+            peak[0] = max(peak[0], rss_mb())
+            await asyncio.sleep(0.2)
+
+    sampler = asyncio.create_task(sample_rss())
+    ru0_self = resource.getrusage(resource.RUSAGE_SELF)
+    ru0_child = resource.getrusage(resource.RUSAGE_CHILDREN)
+    t0 = time.perf_counter()
+
+    url = f"ws://127.0.0.1:{port}/ws"
+    results = await asyncio.gather(*[
+        run_client(url, chunks, args.chunk_ms, args.mode, args.turns, args.pcm_rate) for _ in range(args.clients)
+    ])
+
+    wall = time.perf_counter() - t0
+    sampler.cancel()
+    server.should_exit = True
+    await server_task
+    ru1_self = resource.getrusage(resource.RUSAGE_SELF)
+    ru1_child = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (ru1_self.ru_utime + ru1_self.ru_stime - ru0_self.ru_utime - ru0_self.ru_stime
+           + ru1_child.ru_utime + ru1_child.ru_stime - ru0_child.ru_utime - ru0_child.ru_stime)
+
+    report = {
+        "git_rev": git_rev(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "wall_sec": wall,
+        "cpu_sec": round(cpu, 3),
+        "peak_rss_mb": round(peak[0], 1),
+        "time_to_first_transcript": summarize([r["ttft"] for r in results if r["ttft"] is not None]),
+        "time_to_first_audio": summarize([x for r in results for x in r["tfa"]]),
+        "turn_latency": summarize([x for r in results for x in r["turns"]]),
+        "cancelled_turns": sum(r["cancelled"] for r in results),
+        "errors": sum(r["errors"] for r in results),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        compare(report, args.compare)
+    if report["turn_latency"] is None:
+        sys.exit(f"error: no turn completed ({report['cancelled_turns']} cancelled by barge-in)")
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Voice chat backend load test")
+    p.add_argument("--clients", type=int, default=4, help="同時接続クライアント数")
+    p.add_argument("--audio", help="送信する webm/opus ファイル（省略時はトーン音声を生成）")
+    p.add_argument("--seconds", type=float, default=12.0, help="生成する音声の長さ")
+    p.add_argument("--chunk-ms", type=int, default=250, help="送信チャンク間隔（AudioRecorder と同じ）")
+    p.add_argument("--pcm-rate", type=int, default=0,
+                   help="raw PCM16 をこのサンプルレートで送る（0=webm/opus）")
+    p.add_argument("--mode", default="雑談")
+    p.add_argument("--turns", type=int, default=3, help="クライアントあたりの最大 chat ターン数")
+    p.add_argument("--real", action="store_true", help="スタブを使わず実モデル・実 OpenAI で計測")
+    p.add_argument("--barge-in", action="store_true",
+                   help="barge-in を有効のまま計測（既定は BARGE_IN=0。応答中の発話で応答が取り消される）")
+    p.add_argument("--asr-rtf", type=float, default=0.05, help="スタブASRの実時間係数")
+    p.add_argument("--llm-first-token", type=float, default=0.3, help="スタブLLMの初回トークンまでの秒数")
+    p.add_argument("--llm-token-interval", type=float, default=0.02, help="スタブLLMのトークン間隔")
+    p.add_argument("--tts-sec-per-char", type=float, default=0.005, help="スタブTTSの1文字あたり合成秒数")
+    p.add_argument("--transcript", default="今日の予定を教えてください。")
+    p.add_argument("--reply", default="承知しました。本日の予定は三件です。午前は会議、午後は点検があります。")
+    p.add_argument("--out", help="結果 JSON の保存先")
+    p.add_argument("--compare", help="比較対象の結果 JSON")
+    return p.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,196 @@
+# backend/models/asr_backends.py
+import bisect
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models.audio_decoder import SAMPLE_RATE
+
+# エンジン名の別名（WHISPER_MODEL_NAME / change_models では "<engine>:<model>" で指定）
+ENGINE_ALIASES = {
+    "whisper_streaming": "whisper_streaming",
+    "ws": "whisper_streaming",
+    "faster_whisper": "faster_whisper",
+    "faster": "faster_whisper",
+    "ct2": "faster_whisper",
+}
+
+
+def parse_model_spec(spec: str, default_engine: str = "whisper_streaming") -> Tuple[str, str]:
+    """
+    "small" → (default_engine, "small")、"faster:small" → ("faster_whisper", "small")。
+    未知のエンジン名は ValueError。
+    """
+    engine, sep, model = spec.partition(":")
+    if not sep:
+        engine, model = default_engine, spec
+    if engine not in ENGINE_ALIASES:
+        raise ValueError(f"unknown ASR engine: {engine}")
+    return ENGINE_ALIASES[engine], model
+
+
+class ASRBackend(ABC):
+    """
+    ASR エンジンの共通インタフェース。
+    transcribe は 16kHz/mono float32 を受けて parse_result 互換（{"text", "segments"} か文字列）を返す。
+    複数音声を1回で処理できるエンジンは transcribe_batch も実装する（asr_scheduler.transcribe_batch が使う）。
+    max_concurrency は同じモデルで同時に実行してよいバッチ数（スケジューラの同時実行数になる）。
+    """
+    engine = ""
+    max_concurrency = 1
+
+    @abstractmethod
+    def transcribe(self, audio: np.ndarray):
+        ...
+
+    def info(self) -> Dict[str, Any]:
+        return {"engine": self.engine}
+
+
+class WhisperStreamingBackend(ASRBackend):
+    """whisper-streaming の Transcriber（従来の既定エンジン）。バッチAPIが無いのでバッチ内は逐次処理"""
+    engine = "whisper_streaming"
+
+    def __init__(self, model_dir: str):
+        from whisper_streaming import Transcriber  # 遅延import
+        self.transcriber = Transcriber(model_path=model_dir, vad=True)
+
+    def transcribe(self, audio: np.ndarray):
+        return self.transcriber.transcribe(audio)
+
+
+class FasterWhisperBackend(ASRBackend):
+    """
+    CTranslate2（faster-whisper）エンジン。CPU では int8 量子化で1コアあたりのスループットが上がる。
+    - compute_type: int8 / int8_float16（GPU）/ int8_float32 / float16 / float32
+    - cpu_threads: 1モデルあたりの intra-op スレッド数（0 で自動）
+    - num_workers: 同じモデルで同時に推論できる数（スケジューラは num_workers 個のバッチを並行実行する）
+    - batched: 複数セッションの音声を BatchedInferencePipeline で1回のバッチ forward にまとめる
+      （faster-whisper >= 1.1。無い場合は num_workers 本のスレッドで並行処理）
+    """
+    engine = "faster_whisper"
+
+    def __init__(
+        self,
+        model_ref: str,
+        device: str = "cpu",
+        compute_type: str = "int8",
+        beam_size: int = 1,
+        cpu_threads: int = 0,
+        num_workers: int = 1,
+        language: Optional[str] = None,
+        batched: bool = True,
+    ):
+        from faster_whisper import WhisperModel  # 任意依存（pip install faster-whisper）
+        self.model = WhisperModel(
+            model_ref,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=cpu_threads,
+            num_workers=num_workers,
+        )
+        self.device = device
+        self.compute_type = compute_type
+        self.beam_size = max(1, beam_size)
+        self.cpu_threads = cpu_threads
+        self.num_workers = max(1, num_workers)
+        self.language = language or None
+        self.max_concurrency = self.num_workers
+        self._batched = None
+        if batched:
+            try:
+                from faster_whisper import BatchedInferencePipeline
+                self._batched = BatchedInferencePipeline(model=self.model)
+            except ImportError:
+                pass
+        self._pool = None
+        if self._batched is None and self.num_workers > 1:
+            self._pool = ThreadPoolExecutor(max_workers=self.num_workers)
+
+    def transcribe(self, audio: np.ndarray) -> dict:
+        segments, _ = self.model.transcribe(
+            audio,
+            beam_size=self.beam_size,
+            language=self.language,
+            # 発話区間は前段の VAD で切り出し済み・窓ごとに独立して認識する
+            vad_filter=False,
+            condition_on_previous_text=False,
+        )
+        segs = [{"start": s.start, "end": s.end, "text": s.text} for s in segments]
+        return {"text": "".join(s["text"] for s in segs).strip(), "segments": segs}
+
+    def transcribe_batch(self, audios: List[np.ndarray]) -> List[dict]:
+        if len(audios) < 2:
+            return [self.transcribe(a) for a in audios]
+        if self._batched is not None:
+            return self._transcribe_batched(audios)
+        if self._pool is not None:
+            return list(self._pool.map(self.transcribe, audios))
+        return [self.transcribe(a) for a in audios]
+
+    def _transcribe_batched(self, audios: List[np.ndarray]) -> List[dict]:
+        # 各音声を連結し、clip_timestamps で1音声=1チャンクとして指定すると、
+        # 全チャンクのメル特徴量をまとめた1回の encode/generate で認識される
+        results: List[dict] = [{"text": "", "segments": []} for _ in audios]
+        clips, starts, owners, offset = [], [], [], 0
+        for i, a in enumerate(audios):
+            if len(a):
+                clips.append({"start": offset / SAMPLE_RATE, "end": (offset + len(a)) / SAMPLE_RATE})
+                starts.append(offset / SAMPLE_RATE)
+                owners.append(i)
+                offset += len(a)
+        if not clips:
+            return results
+        segments, _ = self._batched.transcribe(
+            np.concatenate([a for a in audios if len(a)]),
+            clip_timestamps=clips,
+            batch_size=len(clips),
+            beam_size=self.beam_size,
+            language=self.language,
+            without_timestamps=False,  # 確定部分の音声切り捨てにセグメント境界を使う
+        )
+        for s in segments:
+            # セグメントの時刻は連結後の位置。開始時刻でどの音声のものかを判定し、音声先頭からの時刻に戻す
+            k = max(0, bisect.bisect_right(starts, s.start + 1e-3) - 1)
+            results[owners[k]]["segments"].append(
+                {"start": s.start - starts[k], "end": s.end - starts[k], "text": s.text}
+            )
+        for r in results:
+            r["text"] = "".join(seg["text"] for seg in r["segments"]).strip()
+        return results
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "engine": self.engine,
+            "device": self.device,
+            "compute_type": self.compute_type,
+            "beam_size": self.beam_size,
+            "cpu_threads": self.cpu_threads,
+            "num_workers": self.num_workers,
+            "batched": self._batched is not None,
+        }
+
+
+def resolve_model(engine: str, model: str, models_base_path: str) -> str:
+    """
+    ローカルのモデルディレクトリ（models_base_path/<model>）を返す。
+    faster-whisper はディレクトリが無ければモデル名（"small" 等、CTranslate2 変換済みを取得）をそのまま使う。
+    """
+    model_dir = os.path.join(models_base_path, model)
+    if os.path.isdir(model_dir):
+        return model_dir
+    if engine == "faster_whisper":
+        return model
+    raise FileNotFoundError(f"Whisper model not found: {model_dir}")
+
+
+def create_asr_backend(engine: str, model_ref: str, options: Optional[Dict[str, Any]] = None) -> ASRBackend:
+    """options はエンジン固有の設定（faster_whisper: compute_type / beam_size / cpu_threads 等）"""
+    if engine == "whisper_streaming":
+        return WhisperStreamingBackend(model_ref)
+    if engine == "faster_whisper":
+        return FasterWhisperBackend(model_ref, **(options or {}))
+    raise ValueError(f"unknown ASR engine: {engine}")
@@ -0,0 +1,152 @@
+# backend/models/asr_scheduler.py
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from utils.metrics import observe
+
+
+class ASRBusyError(Exception):
+    """待ち件数が上限に達したため best-effort の要求（partial）を受け付けない"""
+
+
+class BatchScheduler:
+    """
+    複数セッションから届いた音声ウィンドウを短い時間窓で集約し、1回のバッチ推論で処理する。
+    結果は投入時の Future 経由で各セッションへ返す。
+    - window_ms: 最初の要求到着から待つ最大時間
+    - max_batch_size: 1バッチの上限件数（到達したら即実行）
+    - run_batch: 音声リストを受け取り認識結果（parse_result 形式）のリストを返すコルーチン（実行先は呼び出し側が決める）
+    - max_pending: 待ち件数がこれ以上なら best_effort の要求を即座に ASRBusyError で断る（0 で無制限）
+    - max_concurrency: 同時に実行するバッチ数。実行中バッチが上限の間は集約を始めないので、
+      待っている間に届いた要求は次のバッチにまとまる（実行中に変更してよい）
+    """
+    def __init__(
+        self,
+        run_batch: Callable[[List[np.ndarray]], Awaitable[List[dict]]],
+        window_ms: float = 20.0,
+        max_batch_size: int = 8,
+        max_pending: int = 0,
+        max_concurrency: int = 1,
+    ):
+        self._run_batch = run_batch
+        self.max_pending = max_pending
+        self.window_ms = window_ms
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._running = 0
+        self._slot_free: Optional[asyncio.Event] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches_run = 0
+        self.items_run = 0
+        self.rejected = 0
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = self._queue or asyncio.Queue()
+            self._slot_free = self._slot_free or asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    async def submit(self, audio: np.ndarray, best_effort: bool = False) -> dict:
+        """
+        音声ウィンドウを投入し、そのウィンドウの認識結果を待つ。
+        best_effort（partial など省略してよい要求）は混雑時に ASRBusyError で断る。
+        """
+        self._ensure_worker()
+        if best_effort and self.max_pending > 0 and self._queue.qsize() >= self.max_pending:
+            self.rejected += 1
+            raise ASRBusyError("ASR queue is full")
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((audio, fut, time.perf_counter()))
+        return await fut
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future, float]]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.window_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            # 実行枠が空くまで次のバッチを集めない
+            while self._running >= self.max_concurrency:
+                self._slot_free.clear()
+                await self._slot_free.wait()
+            batch = await self._collect()
+            # キャンセル済み（切断等）の要求は除外
+            batch = [(a, f, t) for a, f, t in batch if not f.done()]
+            if not batch:
+                continue
+            self._running += 1
+            task = asyncio.create_task(self._execute(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, batch: List[Tuple[np.ndarray, asyncio.Future, float]]):
+        try:
+            # 投入からバッチ実行開始までの待ち時間（旧グローバルロック待ちに相当）
+            now = time.perf_counter()
+            for _, _, t in batch:
+                observe("asr_queue_wait", now - t)
+            audios = [a for a, _, _ in batch]
+            try:
+                results = await self._run_batch(audios)
+            except Exception as e:
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                return
+            self.batches_run += 1
+            self.items_run += len(batch)
+            for (_, fut, _), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
+        finally:
+            self._running -= 1
+            self._slot_free.set()
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._queue.qsize() if self._queue else 0,
+            "running": self._running,
+            "max_concurrency": self.max_concurrency,
+            "batches_run": self.batches_run,
+            "avg_batch_size": (self.items_run / self.batches_run) if self.batches_run else 0.0,
+            "rejected": self.rejected,
+        }
+
+
+def parse_result(result) -> dict:
+    """
+    whisper-streaming の戻り値を {"text": str, "segments": [(start, end, text), ...]} に揃える。
+    セグメント（秒単位のタイムスタンプ）が取れない場合は空リスト。
+    """
+    if isinstance(result, dict):
+        segments = []
+        for seg in result.get("segments") or []:
+            if isinstance(seg, dict) and "start" in seg and "end" in seg:
+                segments.append((float(seg["start"]), float(seg["end"]), seg.get("text", "")))
+        return {"text": result.get("text", ""), "segments": segments}
+    return {"text": str(result), "segments": []}
+
+
+def transcribe_batch(transcriber, audios: List[np.ndarray]) -> List[dict]:
+    """
+    バックエンドがバッチAPI(transcribe_batch)を持っていれば1回の推論で処理（faster-whisper）。
+    無い場合（whisper-streaming）は同一ワーカースレッド内で順に処理する。この場合バッチ化で減るのは
+    executor 往復だけなので、スループットは同時実行バッチ数（max_concurrency）で稼ぐ。
+    """
+    if hasattr(transcriber, "transcribe_batch"):
+        return [parse_result(r) for r in transcriber.transcribe_batch(audios)]
+    return [parse_result(transcriber.transcribe(a)) for a in audios]
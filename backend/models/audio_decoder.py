@@ -0,0 +1,164 @@
+# backend/models/audio_decoder.py
+import asyncio
+from typing import Optional
+
+import numpy as np
+
+from models.resampler import create_resampler
+from utils.metrics import timed
+
+SAMPLE_RATE = 16000
+
+
+def is_stream_start(chunk: bytes) -> bool:
+    """コンテナの先頭（WebM/Matroska の EBML、Ogg、MP4 の ftyp）で始まるチャンクか"""
+    return chunk[:4] in (b"\x1a\x45\xdf\xa3", b"OggS") or chunk[4:8] == b"ftyp"
+
+
+class StreamingDecoder:
+    """
+    WS接続ごとに1本だけ起動する常駐 ffmpeg デコーダ。
+    webm/opus ストリームを stdin に流し込み、stdout から 16kHz/mono の PCM(s16le) を受け取る。
+    MediaRecorder の継続チャンク（コンテナヘッダ無し）も同一ストリームとして扱えるため、
+    チャンク毎のプロセス起動・一時ファイルが不要になる。
+    途中から（ヘッダ無しで）流し込まれる等で ffmpeg が終了した場合は1回だけ例外を投げ、
+    以降は次のストリーム先頭のチャンクが届くまで捨ててから起動し直す。
+    """
+    def __init__(self, sample_rate: int = SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self._proc: Optional[asyncio.subprocess.Process] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._pcm = bytearray()
+        self._closed = False
+        self._waiting_header = False
+        self.restarts = 0
+
+    async def start(self):
+        cmd = [
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-fflags", "nobuffer", "-flags", "low_delay",
+            "-probesize", "32", "-analyzeduration", "0",
+            "-i", "pipe:0",
+            "-f", "s16le", "-acodec", "pcm_s16le",
+            "-ar", str(self.sample_rate), "-ac", "1",
+            "pipe:1",
+        ]
+        self._proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self):
+        # stdout を随時読み出して内部バッファへ
+        while True:
+            data = await self._proc.stdout.read(4096)
+            if not data:
+                break
+            self._pcm.extend(data)
+
+    def _reset(self):
+        # 終了した ffmpeg を手放し、次のストリーム先頭を待つ状態にする
+        if self._reader:
+            self._reader.cancel()
+        self._proc = None
+        self._reader = None
+        self._waiting_header = True
+
+    async def feed(self, chunk: bytes):
+        """受信チャンクをそのまま ffmpeg の stdin へ書き込む"""
+        if self._proc is not None and self._proc.returncode is not None:
+            code = self._proc.returncode
+            self._reset()
+            if not is_stream_start(chunk):
+                raise RuntimeError(f"ffmpeg decoder exited (code={code})")
+        if self._waiting_header:
+            if not is_stream_start(chunk):
+                return
+            self._waiting_header = False
+            self.restarts += 1
+        if self._proc is None:
+            await self.start()
+        try:
+            with timed("ffmpeg_feed"):
+                self._proc.stdin.write(chunk)
+                await self._proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            code = await self._proc.wait()
+            self._reset()
+            raise RuntimeError(f"ffmpeg decoder exited (code={code})")
+
+    def read(self) -> np.ndarray:
+        """
+        これまでにデコード済みの PCM を float32(-1.0〜1.0) で取り出す。
+        奇数バイトの端数は次回に持ち越す。
+        """
+        n = len(self._pcm) - (len(self._pcm) % 2)
+        if n == 0:
+            return np.zeros(0, dtype=np.float32)
+        raw = bytes(self._pcm[:n])
+        del self._pcm[:n]
+        return np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+
+    async def close(self):
+        if self._closed or self._proc is None:
+            self._closed = True
+            return
+        self._closed = True
+        try:
+            if self._proc.stdin and not self._proc.stdin.is_closing():
+                self._proc.stdin.close()
+            await asyncio.wait_for(self._proc.wait(), timeout=2.0)
+        except (asyncio.TimeoutError, ProcessLookupError, BrokenPipeError, ConnectionResetError):
+            try:
+                self._proc.kill()
+            except ProcessLookupError:
+                pass
+        if self._reader:
+            self._reader.cancel()
+
+
+class PCMDecoder:
+    """
+    raw PCM16（s16le, インターリーブ）をそのまま受け取る入力。ffmpeg を起動せず、
+    int16 → float32 の変換とチャンネル平均・16kHz へのリサンプリングをプロセス内で行う。
+    StreamingDecoder と同じ feed / read / close を持つ（AudioWorklet 等で PCM を送るクライアント用）。
+    """
+    def __init__(self, input_rate: int, channels: int = 1, sample_rate: int = SAMPLE_RATE,
+                 resampler: str = "auto"):
+        if not 8000 <= input_rate <= 192000:
+            raise ValueError(f"unsupported sample rate: {input_rate}")
+        if not 1 <= channels <= 8:
+            raise ValueError(f"unsupported channels: {channels}")
+        self.input_rate = input_rate
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.resampler = create_resampler(input_rate, sample_rate, resampler)
+        self._frame = 2 * channels
+        self._rest = b""  # フレーム境界に満たない端数（次のチャンクへ持ち越す）
+        self._out = []
+
+    async def feed(self, chunk: bytes):
+        data = self._rest + chunk
+        n = len(data) - (len(data) % self._frame)
+        self._rest = data[n:]
+        if n == 0:
+            return
+        with timed("pcm_resample"):
+            x = np.frombuffer(data[:n], dtype="<i2").astype(np.float32) / 32768.0
+            if self.channels > 1:
+                x = x.reshape(-1, self.channels).mean(axis=1)
+            self._out.append(self.resampler.process(x))
+
+    def read(self) -> np.ndarray:
+        """これまでに変換済みの 16kHz/mono float32 を取り出す"""
+        if not self._out:
+            return np.zeros(0, dtype=np.float32)
+        out = self._out[0] if len(self._out) == 1 else np.concatenate(self._out)
+        self._out = []
+        return out
+
+    async def close(self):
+        self._out = []
@@ -0,0 +1,125 @@
+# backend/models/openai_manager.py
+import asyncio
+import random
+from typing import AsyncIterator, Dict, List, Optional
+
+
+class OpenAIManager:
+    """
+    非同期 OpenAI クライアント。イベントループをブロックしない。
+    - HTTP コネクションプールを共有（keep-alive 再利用）
+    - 同時リクエスト数を Semaphore で制限
+    - タイムアウトと指数バックオフ付きリトライ（ストリームは最初のトークン受信前のみ）
+    - SDK の import とクライアント生成は start()（または初回使用時）まで遅延する
+    """
+    def __init__(
+        self,
+        api_key: str,
+        max_concurrency: int = 16,
+        timeout_sec: float = 60.0,
+        connect_timeout_sec: float = 5.0,
+        max_retries: int = 3,
+        backoff_base_sec: float = 0.5,
+        max_connections: int = 32,
+    ):
+        self.api_key = api_key
+        self.timeout_sec = timeout_sec
+        self.connect_timeout_sec = connect_timeout_sec
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.backoff_base_sec = backoff_base_sec
+        self._http = None
+        self.client = None
+        self._retryable: tuple = ()
+        self._sem = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.retries = 0
+
+    def _build(self):
+        if self.client is not None:
+            return
+        import httpx
+        from openai import (
+            APIConnectionError,
+            APITimeoutError,
+            AsyncOpenAI,
+            InternalServerError,
+            RateLimitError,
+        )
+        # 再試行対象（接続断・タイムアウト・429・5xx）
+        self._retryable = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+                keepalive_expiry=30.0,
+            ),
+            timeout=httpx.Timeout(self.timeout_sec, connect=self.connect_timeout_sec),
+        )
+        # リトライは自前で行うため SDK 側は無効化
+        self.client = AsyncOpenAI(api_key=self.api_key, http_client=self._http, max_retries=0)
+
+    async def start(self, warm_connection: bool = True) -> Optional[str]:
+        """
+        クライアントを生成し、warm_connection なら軽い API 呼び出しで接続（TLS）を張っておく。
+        接続の事前確立は best-effort で、失敗しても例外にせずエラー文字列を返す。
+        """
+        self._build()
+        if not warm_connection:
+            return None
+        try:
+            await self.client.models.list()
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+        return None
+
+    async def _create(self, **kwargs):
+        self._build()
+        attempt = 0
+        while True:
+            try:
+                return await self.client.chat.completions.create(**kwargs)
+            except self._retryable:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_base_sec * (2 ** attempt) * (1 + random.random() * 0.25)
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+    async def complete(self, model: str, messages: List[Dict[str, str]], temperature: float = 0.7) -> str:
+        async with self._sem:
+            self.in_flight += 1
+            try:
+                completion = await self._create(model=model, messages=messages, temperature=temperature)
+            finally:
+                self.in_flight -= 1
+        return completion.choices[0].message.content
+
+    async def stream(
+        self, model: str, messages: List[Dict[str, str]], temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        """テキスト差分を順次返す"""
+        async with self._sem:
+            self.in_flight += 1
+            try:
+                stream = await self._create(
+                    model=model, messages=messages, temperature=temperature, stream=True
+                )
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "retries": self.retries,
+        }
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.close()
@@ -0,0 +1,90 @@
+# backend/models/resampler.py
+from math import gcd
+
+import numpy as np
+
+RESAMPLERS = ("auto", "soxr", "polyphase")
+
+
+class PolyphaseResampler:
+    """
+    ストリーミング用のポリフェーズ FIR リサンプラ（numpy のみ、外部プロセス不要）。
+    in_rate → out_rate を up/down（互いに素）の有理比で変換する。
+    フィルタは scipy.signal.resample_poly と同じ Kaiser 窓 sinc（half_len = 10 * max(up, down)）。
+    チャンク境界をまたいでも連続した1本の信号として処理するため、分割の仕方で結果は変わらない。
+    出力はフィルタの群遅延（half_len / up 入力サンプル、数 ms）だけ遅れる。
+    """
+    name = "polyphase"
+
+    def __init__(self, in_rate: int, out_rate: int, kaiser_beta: float = 5.0):
+        g = gcd(in_rate, out_rate)
+        self.up = out_rate // g
+        self.down = in_rate // g
+        up, down = self.up, self.down
+
+        half_len = 10 * max(up, down)
+        n = np.arange(2 * half_len + 1) - half_len
+        cutoff = 1.0 / max(up, down)
+        h = cutoff * np.sinc(cutoff * n) * np.kaiser(len(n), kaiser_beta)
+        h *= up / h.sum()  # 直流ゲインを1に（ゼロ挿入で下がる分を up 倍で補う）
+
+        # 位相ごとの係数 taps[p, k] = h[p + k*up]（入力 x[base - k] に掛ける）
+        self.n_taps = -(-len(h) // up)
+        h = np.pad(h, (0, self.n_taps * up - len(h)))
+        self.taps = h.reshape(self.n_taps, up).T.astype(np.float32)
+
+        # 入力履歴: _buf[0] が絶対位置 _offset の入力サンプル（先頭はゼロで埋めておく）
+        self._buf = np.zeros(self.n_taps - 1, dtype=np.float32)
+        self._offset = -(self.n_taps - 1)
+        self._received = 0  # これまでの入力サンプル数
+        self._produced = 0  # これまでの出力サンプル数
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        if self.up == self.down:
+            return x.astype(np.float32, copy=False)
+        self._buf = np.concatenate([self._buf, x.astype(np.float32, copy=False)])
+        self._received += len(x)
+
+        # 出力 n は入力 base = floor(n*down/up) までを使う → 入力が揃っている分だけ出す
+        end = (self._received * self.up - 1) // self.down + 1
+        if end <= self._produced:
+            return np.zeros(0, dtype=np.float32)
+        pos = np.arange(self._produced, end, dtype=np.int64) * self.down
+        base = pos // self.up - self._offset
+        phase = pos % self.up
+        # (出力数, n_taps) の入力窓をまとめて取り出して位相別の係数と内積
+        window = self._buf[base[:, None] - np.arange(self.n_taps)[None, :]]
+        y = np.einsum("ij,ij->i", window, self.taps[phase])
+        self._produced = end
+
+        # 次の出力で必要になる入力（base - n_taps + 1 以降）だけ残す
+        keep_from = (end * self.down) // self.up - (self.n_taps - 1) - self._offset
+        if keep_from > 0:
+            self._buf = self._buf[keep_from:]
+            self._offset += keep_from
+        return y
+
+
+class SoxrResampler:
+    """python-soxr（任意依存: pip install soxr）のストリーミング変換。利用可能なら polyphase より速い"""
+    name = "soxr"
+
+    def __init__(self, in_rate: int, out_rate: int):
+        import soxr
+        self._stream = soxr.ResampleStream(in_rate, out_rate, 1, dtype="float32")
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        return self._stream.resample_chunk(x.astype(np.float32, copy=False))
+
+
+def create_resampler(in_rate: int, out_rate: int, kind: str = "auto"):
+    """kind: auto（soxr があれば soxr、無ければ polyphase）/ soxr / polyphase"""
+    if kind not in RESAMPLERS:
+        raise ValueError(f"unknown resampler: {kind}")
+    if kind in ("auto", "soxr") and in_rate != out_rate:
+        try:
+            return SoxrResampler(in_rate, out_rate)
+        except ImportError:
+            if kind == "soxr":
+                raise
+    return PolyphaseResampler(in_rate, out_rate)
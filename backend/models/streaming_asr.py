@@ -0,0 +1,150 @@
+# backend/models/streaming_asr.py
+import re
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from models.audio_decoder import SAMPLE_RATE
+
+
+# 空白で単語を区切らない言語（文字単位で一致判定する）
+CHAR_LANGUAGES = {"ja", "zh", "yue", "th", "lo", "km", "my", "bo"}
+# 仮名・CJK 統合漢字・タイ文字など（言語が自動判定のときの判別用）
+_CHAR_SCRIPT = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f\u0e00-\u0e7f]")
+# 文字単位モードでも英数字の並びは1トークンにする
+_CHAR_TOKEN = re.compile(r"[A-Za-z0-9]+(?:['.][A-Za-z0-9]+)*|\S")
+_WORDLIKE = re.compile(r"[A-Za-z0-9]")
+
+
+def detect_mode(text: str) -> str:
+    """仮説テキストから分割方式を判定（"char" / "word"）"""
+    return "char" if _CHAR_SCRIPT.search(text) else "word"
+
+
+def tokenize(text: str, mode: str) -> List[str]:
+    """
+    一致判定用の分割。"word" は空白区切りの単語単位、"char" は文字単位（空白は無視し、英数字の並びは1トークン）。
+    仮説とセグメントで同じ mode を使うこと（分割がずれると確定部分と一致しなくなる）。
+    """
+    if mode == "word":
+        return text.split()
+    return _CHAR_TOKEN.findall(text)
+
+
+def join_tokens(a: str, b: str, mode: str) -> str:
+    """テキスト同士を連結。word は空白で、char は英数字同士が接する場合だけ空白を挟む"""
+    if not a or not b:
+        return a or b
+    if mode == "word" or (_WORDLIKE.match(a[-1]) and _WORDLIKE.match(b[0])):
+        return f"{a} {b}"
+    return a + b
+
+
+def detokenize(tokens: List[str], mode: str) -> str:
+    text = ""
+    for t in tokens:
+        text = join_tokens(text, t, mode)
+    return text
+
+
+def common_prefix_len(a: List[str], b: List[str]) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class StreamingTranscript:
+    """
+    セッションごとのストリーミングASR状態（local agreement 方式）。
+    - 発話中の音声に対し、未確定の末尾（tail）だけを繰り返し認識する
+    - 連続する2回の仮説で一致した先頭部分を確定（commit）
+    - セグメントのタイムスタンプが取れる場合、確定済みセグメント分の音声を切り捨てる
+    発話終端（Endpointer）で finalize し、状態をリセットする。
+    分割方式（単語/文字）はセッション単位で固定する。language が CHAR_LANGUAGES なら文字単位、
+    それ以外の指定言語は単語単位、未指定なら最初に得られた仮説の文字種で決める。
+    """
+    def __init__(self, whisper_manager, sample_rate: int = SAMPLE_RATE, partial_interval_ms: int = 500,
+                 language: Optional[str] = None):
+        self.whisper_manager = whisper_manager
+        self.sample_rate = sample_rate
+        self.partial_interval = sample_rate * partial_interval_ms // 1000
+        self.mode: Optional[str] = None
+        if language:
+            self.mode = "char" if language.split("-")[0].lower() in CHAR_LANGUAGES else "word"
+        self._reset()
+
+    def reset(self):
+        """現在の発話の仮説を破棄"""
+        self._reset()
+
+    def _reset(self):
+        self._committed = ""                  # 音声も切り捨て済みの確定テキスト
+        self._tail_committed: List[str] = []  # 確定済みだが音声はまだ tail に残っているトークン
+        self._prev: List[str] = []            # 直前の tail 仮説
+        self._trimmed = 0                     # 発話先頭から切り捨て済みのサンプル数
+        self._last_len = 0                    # 前回 partial 時点の発話長
+
+    def due(self, utterance_len: int) -> bool:
+        """前回の partial から partial_interval 以上音声が増えたか"""
+        return utterance_len - self._last_len >= self.partial_interval
+
+    def _tokenize(self, text: str) -> List[str]:
+        if self.mode is None:
+            if not text.strip():
+                return []
+            self.mode = detect_mode(text)
+        return tokenize(text, self.mode)
+
+    def _text(self, tokens: List[str]) -> str:
+        return join_tokens(self._committed, detokenize(tokens, self.mode), self.mode)
+
+    async def update(self, utterance: np.ndarray) -> Tuple[str, str]:
+        """
+        発話途中の音声（発話先頭から現在まで）で仮説を更新。
+        戻り値は (確定テキスト, 確定+暫定テキスト)。
+        """
+        self._last_len = len(utterance)
+        tail = utterance[self._trimmed:]
+        # partial は省略可能なので混雑時は断られてよい（ASRBusyError は呼び出し側で処理）
+        result = await self.whisper_manager.transcribe_detailed(tail, best_effort=True)
+        hyp = self._tokenize(result["text"])
+
+        agreed = common_prefix_len(self._prev, hyp)
+        if agreed > len(self._tail_committed):
+            self._tail_committed = hyp[:agreed]
+        self._prev = hyp
+        hyp = hyp[self._trim(result["segments"]):]
+
+        tentative = hyp[len(self._tail_committed):] if self._tail_committed == hyp[:len(self._tail_committed)] else []
+        return self._text(self._tail_committed), self._text(self._tail_committed + tentative)
+
+    def _trim(self, segments) -> int:
+        # 確定トークンに完全に含まれるセグメントまで音声を切り捨てる（戻り値は切り捨てたトークン数）
+        cut_tokens, cut_sec = 0, 0.0
+        seg_tokens: List[str] = []
+        for start, end, text in segments:
+            seg_tokens += self._tokenize(text)
+            n = len(seg_tokens)
+            if n > len(self._tail_committed) or seg_tokens != self._tail_committed[:n]:
+                break
+            cut_tokens, cut_sec = n, end
+        if cut_tokens == 0:
+            return 0
+        self._committed = self._text(self._tail_committed[:cut_tokens])
+        self._tail_committed = self._tail_committed[cut_tokens:]
+        self._prev = self._prev[cut_tokens:]
+        self._trimmed += int(cut_sec * self.sample_rate)
+        return cut_tokens
+
+    async def finalize(self, utterance: np.ndarray) -> str:
+        """発話終端。未確定の tail を1回だけ認識して全文を返し、状態をリセット"""
+        tail = utterance[self._trimmed:]
+        text = ""
+        if len(tail):
+            text = (await self.whisper_manager.transcribe_detailed(tail))["text"]
+        result = self._text(self._tokenize(text))
+        self._reset()
+        return result
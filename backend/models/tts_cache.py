@@ -0,0 +1,167 @@
+# backend/models/tts_cache.py
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+
+def normalize_text(text: str) -> str:
+    """キャッシュキー用の正規化（NFKC・前後空白除去・連続空白の圧縮）"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class TTSCache:
+    """
+    合成済み音声の LRU キャッシュ。キーは (モデルタグ, 正規化テキスト)。
+    - max_bytes: メモリ上の合計サイズ上限（超えたら古い順に追い出し）
+    - disk_dir: 指定時はディスクにも保存し、メモリから追い出された後・再起動後も再利用
+    - disk_max_bytes: ディスク上の合計サイズ上限（0 で無制限）。超えたら最終利用が古いファイルから削除
+    ディスクの読み書きは専用の1スレッドで行い、イベントループを塞がない（書き込みは完了を待たない）。
+    """
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._items: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # ディスク上のファイル（パス → サイズ、最終利用順）。専用スレッドからのみ触る
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_size = 0
+        self.disk_evictions = 0
+        self._io: Optional[ThreadPoolExecutor] = None
+        if disk_dir:
+            self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-cache")
+            self._io.submit(self._scan_disk)
+
+    @staticmethod
+    def make_key(model_tag: str, text: str) -> Tuple[str, str]:
+        return (model_tag, normalize_text(text))
+
+    def _disk_path(self, key: Tuple[str, str]) -> str:
+        digest = hashlib.sha1("\0".join(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.bin")
+
+    async def get(self, model_tag: str, text: str) -> Optional[bytes]:
+        key = self.make_key(model_tag, text)
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return data
+        if self._io is not None:
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(self._io, self._read_disk, self._disk_path(key))
+            if data is not None:
+                self._put_memory(key, data)
+                with self._lock:
+                    self.hits += 1
+                return data
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, model_tag: str, text: str, data: bytes):
+        key = self.make_key(model_tag, text)
+        self._put_memory(key, data)
+        if self._io is not None:
+            self._io.submit(self._write_disk, self._disk_path(key), data)
+
+    def _put_memory(self, key: Tuple[str, str], data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._items[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    # ---- ディスク（専用スレッドから呼ばれる） ----
+    def _scan_disk(self):
+        os.makedirs(self.disk_dir, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.is_file() and entry.name.endswith(".bin"):
+                st = entry.stat()
+                files.append((st.st_mtime, entry.path, st.st_size))
+        for _, path, size in sorted(files):
+            self._disk[path] = size
+            self._disk_size += size
+        self._evict_disk()
+
+    def _read_disk(self, path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # 最終利用時刻（再起動後の追い出し順）
+        except FileNotFoundError:
+            self._forget(path)
+            return None
+        if path not in self._disk:  # 他のワーカーが書いたファイル
+            self._disk_size += len(data)
+        self._disk[path] = len(data)
+        self._disk.move_to_end(path)
+        return data
+
+    def _write_disk(self, path: str, data: bytes):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._forget(path)
+        self._disk[path] = len(data)
+        self._disk_size += len(data)
+        self._evict_disk()
+
+    def _forget(self, path: str):
+        size = self._disk.pop(path, None)
+        if size is not None:
+            self._disk_size -= size
+
+    def _evict_disk(self):
+        while self.disk_max_bytes and self._disk_size > self.disk_max_bytes and self._disk:
+            path, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.disk_evictions += 1
+
+    def close(self):
+        if self._io is not None:
+            self._io.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            stats = {
+                "entries": len(self._items),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+        if self.disk_dir:
+            stats.update(
+                disk_entries=len(self._disk),
+                disk_bytes=self._disk_size,
+                disk_max_bytes=self.disk_max_bytes,
+                disk_evictions=self.disk_evictions,
+            )
+        return stats
@@ -1,38 +1,125 @@
 # backend/models/tts_espnet.py
-import os
-import base64
-import tempfile
+import io
+import numpy as np
 import soundfile as sf
-import torch
 import asyncio
-from espnet2.bin.tts_inference import Text2Speech
+from typing import Iterable, Optional
+from models.tts_cache import TTSCache
+from models.tts_executor import PRIORITY_HIGH, PRIORITY_NORMAL, TTSExecutor
+from utils.metrics import timed
+
+# 出力フォーマット: (soundfile format, subtype, MIME)
+AUDIO_FORMATS = {
+    "wav": ("WAV", "PCM_16", "audio/wav"),
+    "ogg": ("OGG", "VORBIS", "audio/ogg"),
+    "opus": ("OGG", "OPUS", "audio/ogg; codecs=opus"),
+}
+# Opus が受け付けるサンプルレート
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+# ウォームアップ用のダミー文（初回推論のカーネル初期化を起動時に済ませる）
+WARMUP_TEXT = "こんにちは。"
+
+def encode_audio(wav: np.ndarray, sample_rate: int, fmt: str = "wav") -> bytes:
+    """波形をメモリ上で指定フォーマットへエンコード（一時ファイル無し）"""
+    container, subtype, _ = AUDIO_FORMATS[fmt]
+    if fmt == "opus" and sample_rate not in OPUS_RATES:
+        # Opus 非対応レートは直近上位の対応レートへ線形補間でリサンプル
+        target = next((r for r in OPUS_RATES if r >= sample_rate), OPUS_RATES[-1])
+        n = int(round(len(wav) * target / sample_rate))
+        wav = np.interp(
+            np.arange(n) * (sample_rate / target), np.arange(len(wav)), wav
+        ).astype(np.float32)
+        sample_rate = target
+    buf = io.BytesIO()
+    sf.write(buf, wav, sample_rate, format=container, subtype=subtype)
+    return buf.getvalue()
 
 class TTSManager:
-    def __init__(self, model_tag: str, device: str = "cpu"):
+    def __init__(
+        self,
+        model_tag: str,
+        device: str = "cpu",
+        pool=None,
+        cache: Optional[TTSCache] = None,
+        audio_format: str = "wav",
+        executor: Optional[TTSExecutor] = None,
+        short_text_chars: int = 30,
+        torch_threads: int = 0,
+    ):
+        if audio_format not in AUDIO_FORMATS:
+            raise ValueError(f"unsupported audio format: {audio_format}")
         self.model_tag = model_tag
         self.device = device
+        self.audio_format = audio_format
+        self.mime_type = AUDIO_FORMATS[audio_format][2]
         self.tts = None
+        # pool（ModelWorkerPool）指定時はワーカープロセス側のモデルで合成する
+        self.pool = pool
+        # 同一テキストの再合成を避ける音声キャッシュ
+        self.cache = cache
+        # TTS 専用エグゼキュータ（未指定時は既定のスレッドプール）
+        self.executor = executor
+        # これ以下の文字数は優先度 HIGH で処理
+        self.short_text_chars = short_text_chars
+        # torch の intra-op スレッド数（プロセス全体に効く。0 は torch の既定のまま）
+        self.torch_threads = torch_threads
 
     def load(self):
+        if self.pool is not None:
+            return
+        from espnet2.bin.tts_inference import Text2Speech  # 遅延import（torch も含めて重い）
+        if self.torch_threads > 0:
+            import torch
+            torch.set_num_threads(self.torch_threads)
         self.tts = Text2Speech.from_pretrained(
             model_tag=self.model_tag,
             device=self.device,
         )
 
-    def synthesize_wav_bytes(self, text: str, sample_rate=22050) -> bytes:
+    def warm_up(self):
+        """ダミー文で1回合成・エンコードして捨てる（ワーカープロセス使用時はワーカー側で実施）"""
+        if self.pool is not None:
+            return
+        self.synthesize_bytes(WARMUP_TEXT)
+
+    def synthesize_bytes(self, text: str, sample_rate=22050, fmt: Optional[str] = None) -> bytes:
+        """合成して audio_format（既定）でエンコードしたバイト列を返す"""
         if self.tts is None:
             raise RuntimeError("TTS not loaded.")
-        with torch.no_grad():
+        import torch
+        with timed("tts_synthesis"), torch.no_grad():
             wav = self.tts(text)["wav"].view(-1).cpu().numpy()
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmpf:
-            sf.write(tmpf.name, wav, sample_rate)
-            path = tmpf.name
-        with open(path, "rb") as f:
-            data = f.read()
-        os.remove(path)
-        return data
-
-    async def synthesize_to_b64(self, text: str) -> str:
-        loop = asyncio.get_event_loop()
-        wav_bytes = await loop.run_in_executor(None, self.synthesize_wav_bytes, text)
-        return base64.b64encode(wav_bytes).decode("utf-8")
+        with timed("tts_encode"):
+            return encode_audio(wav, sample_rate, fmt or self.audio_format)
+
+    async def synthesize_cached(self, text: str, priority: Optional[int] = None) -> bytes:
+        """
+        キャッシュ優先で audio_format のバイト列を返す（ミス時は合成してキャッシュへ格納）。
+        priority 未指定時は文字数から決定（短文を優先）。
+        """
+        cache_tag = f"{self.model_tag}:{self.audio_format}"
+        if self.cache is not None:
+            hit = await self.cache.get(cache_tag, text)
+            if hit is not None:
+                return hit
+        # ワーカープロセスでの合成もエグゼキュータ経由（優先度・待ち行列上限を共通にする）
+        synthesize = self.pool.synthesize if self.pool is not None else self.synthesize_bytes
+        if self.executor is not None:
+            if priority is None:
+                priority = PRIORITY_HIGH if len(text) <= self.short_text_chars else PRIORITY_NORMAL
+            audio_bytes = await self.executor.run(synthesize, text, priority=priority)
+        elif self.pool is not None:
+            audio_bytes = await self.pool.synthesize(text)
+        else:
+            loop = asyncio.get_event_loop()
+            audio_bytes = await loop.run_in_executor(None, self.synthesize_bytes, text)
+        if self.cache is not None:
+            self.cache.put(cache_tag, text, audio_bytes)
+        return audio_bytes
+
+    async def precompute(self, texts: Iterable[str]):
+        """固定文言（モード開始時の挨拶など）を事前合成してキャッシュに載せる"""
+        if self.cache is None:
+            return
+        for text in dict.fromkeys(t for t in texts if t):
+            await self.synthesize_cached(text, priority=PRIORITY_HIGH)
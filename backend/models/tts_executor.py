@@ -0,0 +1,97 @@
+# backend/models/tts_executor.py
+import asyncio
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from utils.metrics import observe
+
+# 優先度（小さいほど先に処理）
+PRIORITY_HIGH = 0    # 挨拶・短い定型文
+PRIORITY_NORMAL = 1  # 通常の応答
+PRIORITY_LOW = 2     # レポートのサマリなど長文
+
+
+class TTSBusyError(RuntimeError):
+    """TTS キューが満杯で受け付けられない"""
+
+
+class TTSExecutor:
+    """
+    TTS 専用の有界エグゼキュータ。既定のスレッドプールを Whisper 等と共有しない。
+    - workers: 同時合成数
+    - max_queue: 待ち行列の上限（超過時は TTSBusyError）
+    - 優先度付きキュー（同一優先度は到着順）
+    同期関数は専用スレッドで、コルーチン関数（ワーカープロセスへの合成要求など）はそのまま await する。
+    どちらも同時実行数・優先度・上限は共通。
+    """
+    def __init__(self, workers: int = 2, max_queue: int = 32):
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tts")
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks = []
+        self._seq = itertools.count()
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self._wait_total = 0.0
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue(maxsize=self.max_queue)
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def run(self, fn: Callable, *args, priority: int = PRIORITY_NORMAL) -> Any:
+        """fn(*args) をワーカーで実行。満杯なら即座に TTSBusyError"""
+        self._ensure_started()
+        fut = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((priority, next(self._seq), time.monotonic(), fn, args, fut))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise TTSBusyError("TTS queue is full")
+        return await fut
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, enqueued, fn, args, fut = await self._queue.get()
+            if fut.done():
+                # 呼び出し側がキャンセル済み
+                continue
+            waited = time.monotonic() - enqueued
+            self._wait_total += waited
+            observe("tts_queue_wait", waited)
+            self.running += 1
+            try:
+                if asyncio.iscoroutinefunction(fn):
+                    result = await fn(*args)
+                else:
+                    result = await loop.run_in_executor(self._pool, fn, *args)
+            except Exception as e:
+                if not fut.done():
+                    fut.set_exception(e)
+            else:
+                if not fut.done():
+                    fut.set_result(result)
+            finally:
+                self.running -= 1
+                self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_sec": (self._wait_total / self.completed) if self.completed else 0.0,
+        }
+
+    def shutdown(self):
+        for t in self._tasks:
+            t.cancel()
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,148 @@
+# backend/models/vad.py
+from typing import List
+
+import numpy as np
+
+from models.audio_decoder import SAMPLE_RATE
+
+
+class AudioRingBuffer:
+    """容量固定の float32 リングバッファ（溢れた分は古い方から捨てる）"""
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._buf = np.zeros(self.capacity, dtype=np.float32)
+        self._start = 0
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def write(self, audio: np.ndarray):
+        n = len(audio)
+        if n == 0:
+            return
+        if n >= self.capacity:
+            self._buf[:] = audio[-self.capacity:]
+            self._start, self._len = 0, self.capacity
+            return
+        end = (self._start + self._len) % self.capacity
+        first = min(n, self.capacity - end)
+        self._buf[end:end + first] = audio[:first]
+        self._buf[:n - first] = audio[first:]
+        overflow = max(0, self._len + n - self.capacity)
+        self._start = (self._start + overflow) % self.capacity
+        self._len = min(self.capacity, self._len + n)
+
+    def read(self) -> np.ndarray:
+        idx = (self._start + np.arange(self._len)) % self.capacity
+        return self._buf[idx]
+
+    def clear(self):
+        self._start = 0
+        self._len = 0
+
+
+def frame_energy_db(frames: np.ndarray) -> np.ndarray:
+    """(n_frames, frame_len) → 各フレームの RMS(dBFS)"""
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    return 20.0 * np.log10(rms + 1e-10)
+
+
+class Endpointer:
+    """
+    セッションごとの VAD + 発話区間検出。ASR の前段で無音を捨て、発話終端で1発話分の音声を返す。
+    - backend="energy": フレーム単位の RMS(dB) をまとめてベクトル演算で判定
+    - backend="webrtc": webrtcvad（任意依存）でフレーム判定
+    - hangover_ms: 発話後この時間無音が続いたら終端とみなす
+    - min_speech_ms: これ以上連続で有声なら発話開始
+    - pre_roll_ms: 発話開始前の音声をこの長さだけ含める（語頭欠け防止）
+    - max_utterance_sec: これを超えたら強制的に区切る
+    """
+    def __init__(
+        self,
+        sample_rate: int = SAMPLE_RATE,
+        frame_ms: int = 30,
+        threshold_db: float = -45.0,
+        hangover_ms: int = 600,
+        min_speech_ms: int = 150,
+        pre_roll_ms: int = 300,
+        max_utterance_sec: float = 15.0,
+        backend: str = "energy",
+        webrtc_mode: int = 2,
+    ):
+        self.sample_rate = sample_rate
+        self.frame_len = sample_rate * frame_ms // 1000
+        self.frame_ms = frame_ms
+        self.threshold_db = threshold_db
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.max_utterance_len = int(max_utterance_sec * sample_rate)
+        self._pre_roll = AudioRingBuffer(max(self.frame_len, sample_rate * pre_roll_ms // 1000))
+        self._utterance = AudioRingBuffer(self.max_utterance_len)
+        self._rest = np.zeros(0, dtype=np.float32)
+        self._webrtc = None
+        if backend == "webrtc":
+            import webrtcvad  # 任意依存
+            self._webrtc = webrtcvad.Vad(webrtc_mode)
+        self.in_speech = False
+        self._voiced_run = 0
+        self._silence_run = 0
+
+    def _is_voiced(self, frames: np.ndarray) -> np.ndarray:
+        if self._webrtc is None:
+            return frame_energy_db(frames) > self.threshold_db
+        pcm = (np.clip(frames, -1.0, 1.0) * 32767).astype(np.int16)
+        return np.array([self._webrtc.is_speech(f.tobytes(), self.sample_rate) for f in pcm], dtype=bool)
+
+    def process(self, audio: np.ndarray) -> List[np.ndarray]:
+        """デコード済み音声を投入し、終端まで確定した発話のリストを返す（無音は捨てる）"""
+        audio = np.concatenate([self._rest, audio]) if len(self._rest) else audio
+        n = len(audio) // self.frame_len
+        self._rest = audio[n * self.frame_len:].copy()
+        if n == 0:
+            return []
+        frames = audio[:n * self.frame_len].reshape(n, self.frame_len)
+        voiced = self._is_voiced(frames)
+
+        done = []
+        for frame, v in zip(frames, voiced):
+            if not self.in_speech:
+                self._pre_roll.write(frame)
+                self._voiced_run = self._voiced_run + 1 if v else 0
+                if self._voiced_run >= self.min_speech_frames:
+                    self.in_speech = True
+                    self._silence_run = 0
+                    self._utterance.write(self._pre_roll.read())
+                    self._pre_roll.clear()
+                continue
+            self._utterance.write(frame)
+            self._silence_run = 0 if v else self._silence_run + 1
+            if self._silence_run >= self.hangover_frames or len(self._utterance) >= self.max_utterance_len:
+                done.append(self._finish())
+        return done
+
+    def _finish(self) -> np.ndarray:
+        # 末尾の無音（hangover 分）は ASR に渡さない
+        utterance = self._utterance.read()
+        trim = max(0, self._silence_run - 1) * self.frame_len
+        if trim and trim < len(utterance):
+            utterance = utterance[:-trim]
+        self._utterance.clear()
+        self.in_speech = False
+        self._voiced_run = 0
+        self._silence_run = 0
+        return utterance
+
+    def current(self) -> np.ndarray:
+        """発話途中の音声（発話開始〜現在）。発話中でなければ空配列"""
+        if not self.in_speech:
+            return np.zeros(0, dtype=np.float32)
+        return self._utterance.read()
+
+    def discard(self):
+        """発話途中の音声を捨てる（コマンドとして処理済みの発話など）"""
+        self._utterance.clear()
+        self._pre_roll.clear()
+        self.in_speech = False
+        self._voiced_run = 0
+        self._silence_run = 0
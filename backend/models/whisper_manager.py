@@ -1,102 +1,186 @@
 # backend/models/whisper_manager.py
 import asyncio
-import os
-import tempfile
-from typing import Optional
+import gc
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from models.asr_backends import create_asr_backend, parse_model_spec, resolve_model
+from models.asr_scheduler import BatchScheduler, transcribe_batch
+from models.audio_decoder import SAMPLE_RATE, PCMDecoder, StreamingDecoder
+from utils.metrics import observe, timed
 
 class WhisperManager:
     """
     backend/models/whisper/<model_name> に配置済みのローカルモデルをロードして使用。
-    受信バイト(webm/opus想定)は ffmpeg で 16kHz/mono WAV に変換後、Transcriber へ。
+    受信バイト(webm/opus想定)は接続ごとの常駐 ffmpeg デコーダで 16kHz/mono PCM にし
+    （raw PCM16 を送るクライアントはプロセス内リサンプリングのみ）、
+    float32 配列のまま Transcriber へ渡す。
+    推論はセッション横断のマイクロバッチスケジューラ経由で実行する（_lock はロード専用）。
+    pool（ModelWorkerPool）を渡した場合、モデルはワーカープロセス側に保持し推論もそちらで行う。
+    モデル切替は旧モデルで処理を続けたままバックグラウンドでロード→ウォームアップし、完了時に差し替える。
+    max_resident > 1 の場合、直近に使ったモデルを常駐させて再切替を即時化する。
+    モデル名は "<engine>:<model>"（例: "faster:small"）でエンジンも選べる。省略時は engine。
+    engine_options はエンジン別の設定（{"faster_whisper": {"compute_type": "int8", ...}}）。
     """
-    def __init__(self, models_base_path: str = "backend/models/whisper"):
+    def __init__(
+        self,
+        models_base_path: str = "backend/models/whisper",
+        batch_window_ms: float = 20.0,
+        max_batch_size: int = 8,
+        pool=None,
+        max_resident: int = 1,
+        max_pending: int = 0,
+        engine: str = "whisper_streaming",
+        engine_options: Optional[Dict[str, Dict[str, Any]]] = None,
+    ):
         self.models_base_path = models_base_path
+        self.engine = engine
+        self.engine_options = engine_options or {}
         self.transcriber = None
         self.model_name: Optional[str] = None
         self.model_path: Optional[str] = None
+        self.backend_info: Optional[Dict[str, Any]] = None
+        self.pool = pool
+        self.max_resident = max(1, max_resident)
+        self._resident: "OrderedDict[str, Any]" = OrderedDict()
         self._lock = asyncio.Lock()
+        self._load_task: Optional[asyncio.Task] = None
+        self.load_state: Dict[str, Any] = {"status": "idle", "target": None, "error": None, "elapsed_sec": None}
+        self.scheduler = BatchScheduler(
+            run_batch=self._run_batch,
+            window_ms=batch_window_ms,
+            max_batch_size=max_batch_size,
+            max_pending=max_pending,
+            # ワーカープール使用時はレプリカ数だけバッチを並行に投げる
+            max_concurrency=pool.replicas if pool is not None else 1,
+        )
 
-    async def load(self, model_name: str = "small"):
-        from whisper_streaming import Transcriber  # 遅延import
-        async with self._lock:
-            model_dir = os.path.join(self.models_base_path, model_name)
-            if not os.path.isdir(model_dir):
-                raise FileNotFoundError(f"Whisper model not found: {model_dir}")
-
-            # 以前のモデルのクリーンアップが必要ならここで実施
-            self.transcriber = await asyncio.get_event_loop().run_in_executor(
-                None, lambda: Transcriber(model_path=model_dir, vad=True)
-            )
-            self.model_name = model_name
-            self.model_path = model_dir
+    def start_load(self, model_name: str) -> asyncio.Task:
+        """バックグラウンドでロードを開始（進捗は load_state で参照）"""
+        self._load_task = asyncio.create_task(self._load_logged(model_name))
+        return self._load_task
 
-    async def _convert_to_wav(self, webm_bytes: bytes) -> bytes:
-        """
-        webm/opus → wav(16kHz/mono) へ変換してバイト列で返す
-        """
-        import asyncio as aio
-        with tempfile.NamedTemporaryFile(suffix=".webm", delete=False) as fin:
-            fin.write(webm_bytes)
-            fin.flush()
-            in_path = fin.name
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as fout:
-            out_path = fout.name
-
-        cmd = [
-            "ffmpeg", "-y",
-            "-i", in_path,
-            "-ar", "16000",
-            "-ac", "1",
-            out_path
-        ]
-        proc = await aio.create_subprocess_exec(
-            *cmd, stdout=aio.subprocess.PIPE, stderr=aio.subprocess.PIPE
-        )
-        _, stderr = await proc.communicate()
+    async def _load_logged(self, model_name: str):
         try:
-            os.remove(in_path)
-        finally:
+            await self.load(model_name)
+        except Exception:
+            # 失敗内容は load_state に記録済み。旧モデルで処理を継続する
             pass
-        if proc.returncode != 0:
+
+    async def load(self, model_name: str = "small"):
+        t_wait = time.perf_counter()
+        async with self._lock:
+            observe("whisper_load_lock_wait", time.perf_counter() - t_wait)
+            t0 = time.monotonic()
+            self.load_state = {"status": "loading", "target": model_name, "error": None, "elapsed_sec": None}
             try:
-                os.remove(out_path)
-            finally:
-                pass
-            raise RuntimeError(f"ffmpeg conversion failed: {stderr.decode(errors='ignore')}")
+                engine, model = parse_model_spec(model_name, self.engine)
+                model_dir = resolve_model(engine, model, self.models_base_path)
+                options = self.engine_options.get(engine, {})
+                key = f"{engine}:{model}"
 
-        try:
-            with open(out_path, "rb") as f:
-                wav_bytes = f.read()
-        finally:
-            os.remove(out_path)
-        return wav_bytes
+                if self.pool is not None:
+                    # 各レプリカのプロセス内でロード（1台ずつ切替え、他レプリカは旧モデルで処理継続）
+                    await self.pool.load_whisper(engine, model_dir, options, max_resident=self.max_resident)
+                    backend_info = {"engine": engine, **options}
+                else:
+                    new = self._resident.get(key)
+                    if new is None:
+                        new = await asyncio.get_event_loop().run_in_executor(
+                            None, self._build_transcriber, engine, model_dir, options
+                        )
+                    self._resident.pop(key, None)
+                    self._resident[key] = new
+                    # 差し替え（イベントループ上の代入なので推論中バッチは旧モデルで完走する）
+                    self.transcriber = new
+                    self.scheduler.max_concurrency = new.max_concurrency
+                    self._evict_resident()
+                    backend_info = new.info()
+                self.model_name = model_name
+                self.model_path = model_dir
+                self.backend_info = backend_info
+                observe("whisper_load", time.monotonic() - t0)
+                self.load_state = {
+                    "status": "ready", "target": model_name, "error": None,
+                    "elapsed_sec": round(time.monotonic() - t0, 3),
+                }
+            except Exception as e:
+                self.load_state = {
+                    "status": "error", "target": model_name, "error": str(e),
+                    "elapsed_sec": round(time.monotonic() - t0, 3),
+                }
+                raise
+
+    def _build_transcriber(self, engine: str, model_dir: str, options: Dict[str, Any]):
+        self.load_state["status"] = "loading"
+        transcriber = create_asr_backend(engine, model_dir, options)
+        # 初回推論のカーネル初期化等をここで済ませておく
+        self.load_state["status"] = "warming_up"
+        warm_up(transcriber)
+        return transcriber
+
+    def _evict_resident(self):
+        # 常駐上限を超えた古いモデルを解放（現行モデルは最後尾にいるので残る）
+        evicted = False
+        while len(self._resident) > self.max_resident:
+            self._resident.popitem(last=False)
+            evicted = True
+        if evicted:
+            free_memory()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            **self.load_state,
+            "current": self.model_name,
+            "resident": list(self._resident.keys()),
+            "backend": self.backend_info,
+        }
+
+    def create_decoder(self) -> StreamingDecoder:
+        """WS接続ごとの常駐デコーダを生成（start は初回 feed 時に遅延実行）"""
+        return StreamingDecoder(sample_rate=SAMPLE_RATE)
 
-    async def transcribe_bytes(self, audio_bytes: bytes) -> str:
+    def create_pcm_decoder(self, input_rate: int, channels: int = 1, resampler: str = "auto") -> PCMDecoder:
+        """raw PCM16 入力用（ffmpeg を使わずプロセス内で 16kHz へリサンプリング）"""
+        return PCMDecoder(input_rate, channels=channels, sample_rate=SAMPLE_RATE, resampler=resampler)
+
+    async def transcribe_detailed(self, audio: np.ndarray, best_effort: bool = False) -> dict:
         """
-        受信バイト（webm/opus想定）→ ffmpeg変換 → 一時wav → Transcriber.transcribe()
+        16kHz/mono float32 配列 → スケジューラ（他セッションとまとめてバッチ推論）。
+        テキストとセグメントのタイムスタンプを返す。
+        best_effort=True は混雑時に ASRBusyError で断られる（partial 用）。
         """
-        async with self._lock:
+        if self.model_name is None:
+            raise RuntimeError("Whisper model not loaded.")
+        return await self.scheduler.submit(audio, best_effort=best_effort)
+
+    async def _run_batch(self, audios: List[np.ndarray]) -> List[dict]:
+        with timed("asr_inference"):
+            if self.pool is not None:
+                return await self.pool.transcribe_batch(audios)
             if self.transcriber is None:
                 raise RuntimeError("Whisper model not loaded.")
+            return await asyncio.get_event_loop().run_in_executor(
+                None, transcribe_batch, self.transcriber, audios
+            )
 
-            wav_bytes = await self._convert_to_wav(audio_bytes)
 
-            # Transcriberはファイルパス入力が安定なので一時ファイル経由
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-                tmp.write(wav_bytes)
-                tmp.flush()
-                wav_path = tmp.name
+def warm_up(transcriber):
+    """1秒の無音で1回推論してウォームアップ"""
+    try:
+        transcriber.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32))
+    except Exception:
+        pass
 
-            try:
-                # whisper-streaming の戻り値仕様に合わせて取り出し
-                result = await asyncio.get_event_loop().run_in_executor(
-                    None, lambda: self.transcriber.transcribe(wav_path)
-                )
-                if isinstance(result, dict):
-                    return result.get("text", "")
-                return str(result)
-            finally:
-                try:
-                    os.remove(wav_path)
-                except Exception:
-                    pass
+
+def free_memory():
+    gc.collect()
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except ImportError:
+        pass
@@ -0,0 +1,298 @@
+# backend/models/worker_pool.py
+import asyncio
+import itertools
+import multiprocessing as mp
+import os
+import threading
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait as wait_handles
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+def _worker_main(idx: int, roles: Sequence[str], tts_conf: dict, threads: int, req_q, res_q):
+    """
+    ワーカープロセス本体。自プロセス内に Whisper / ESPnet モデルを保持し、
+    req_q から (op, req_id, payload) を受けて res_q へ (req_id, ok, result) を返す。
+    起動時ロードに失敗した場合は (None, idx, エラー) を返して終了する。
+    """
+    # レプリカ数 × 全コア分のスレッドで CPU を奪い合わないよう、演算ライブラリのスレッド数を揃える
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    from collections import OrderedDict
+
+    from models.asr_backends import create_asr_backend
+    from models.asr_scheduler import transcribe_batch
+    from models.whisper_manager import free_memory, warm_up
+
+    transcriber = None
+    resident = OrderedDict()
+    tts = None
+    if "tts" in roles:
+        try:
+            from models.tts_espnet import TTSManager
+            tts = TTSManager(
+                model_tag=tts_conf["model_tag"],
+                device=tts_conf["device"],
+                audio_format=tts_conf["audio_format"],
+            )
+            tts.load()
+            tts.warm_up()
+        except Exception as e:
+            res_q.put((None, idx, f"TTS load failed: {type(e).__name__}: {e}"))
+            return
+
+    while True:
+        msg = req_q.get()
+        if msg is None:
+            break
+        op, req_id, payload = msg
+        try:
+            if op == "load_whisper":
+                engine, model_dir, options, max_resident = payload
+                key = f"{engine}:{model_dir}"
+                new = resident.pop(key, None)
+                if new is None:
+                    new = create_asr_backend(engine, model_dir, options)
+                    warm_up(new)
+                resident[key] = new
+                transcriber = new
+                if len(resident) > max_resident:
+                    while len(resident) > max_resident:
+                        resident.popitem(last=False)
+                    free_memory()
+                result = True
+            elif op == "transcribe":
+                if transcriber is None:
+                    raise RuntimeError("Whisper model not loaded.")
+                shm_name, offsets = payload
+                shm = shared_memory.SharedMemory(name=shm_name)
+                try:
+                    buf = np.ndarray((offsets[-1],), dtype=np.float32, buffer=shm.buf)
+                    audios = [buf[b:e].copy() for b, e in zip(offsets[:-1], offsets[1:])]
+                    del buf
+                finally:
+                    shm.close()
+                result = transcribe_batch(transcriber, audios)
+            elif op == "ping":
+                # 起動時ロードが終わって要求を処理できる状態か
+                result = True
+            elif op == "synthesize":
+                if tts is None:
+                    raise RuntimeError("TTS not loaded.")
+                result = tts.synthesize_bytes(payload)
+            else:
+                raise ValueError(f"unknown op: {op}")
+            res_q.put((req_id, True, result))
+        except Exception as e:
+            res_q.put((req_id, False, f"{type(e).__name__}: {e}"))
+
+
+class ModelWorkerPool:
+    """
+    ASR/TTS 用のワーカープロセスプール。
+    - 各レプリカは自プロセス内に Whisper と/または ESPnet モデルを保持（GILを共有しない）
+    - 音声は共有メモリ経由で受け渡し（pickle コピー無し）
+    - ディスパッチは処理中件数が最小の生存レプリカへ（least-loaded）
+    - レプリカが終了したら処理中の要求をエラーで返す。推論要求は request_timeout_sec で打ち切る
+    - threads: レプリカあたりの演算スレッド数（0 で cpu_count / replicas）
+    """
+    def __init__(
+        self,
+        replicas: int,
+        roles: Sequence[str] = ("asr", "tts"),
+        tts_model_tag: Optional[str] = None,
+        tts_device: str = "cpu",
+        tts_audio_format: str = "wav",
+        threads: int = 0,
+        request_timeout_sec: float = 30.0,
+    ):
+        self.replicas = max(1, replicas)
+        self.roles = tuple(roles)
+        self.tts_conf = {"model_tag": tts_model_tag, "device": tts_device, "audio_format": tts_audio_format}
+        self.threads = threads if threads > 0 else max(1, (os.cpu_count() or 1) // self.replicas)
+        self.request_timeout_sec = request_timeout_sec
+        self._ctx = mp.get_context("spawn")
+        self._req_qs: List = []
+        self._res_q = None
+        self._procs: List = []
+        self._inflight: List[int] = [0] * self.replicas
+        self._processed: List[int] = [0] * self.replicas
+        self._errors: List[Optional[str]] = [None] * self.replicas  # 終了したレプリカの理由
+        self._pending: Dict[int, tuple] = {}
+        self._ids = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reader: Optional[threading.Thread] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._closing = False
+
+    def has_role(self, role: str) -> bool:
+        return role in self.roles
+
+    def start(self):
+        self._loop = asyncio.get_event_loop()
+        self._res_q = self._ctx.Queue()
+        for i in range(self.replicas):
+            q = self._ctx.Queue()
+            p = self._ctx.Process(
+                target=_worker_main,
+                args=(i, self.roles, self.tts_conf, self.threads, q, self._res_q),
+                daemon=True,
+            )
+            p.start()
+            self._req_qs.append(q)
+            self._procs.append(p)
+        self._reader = threading.Thread(target=self._read_results, daemon=True)
+        self._reader.start()
+        self._watcher = threading.Thread(target=self._watch_exits, daemon=True)
+        self._watcher.start()
+
+    def _read_results(self):
+        # 結果キューを別スレッドで待ち受け、イベントループ側で Future を解決
+        while True:
+            msg = self._res_q.get()
+            if msg is None:
+                break
+            if msg[0] is None:
+                # 起動時ロードの失敗通知（このあとプロセスは終了する）
+                _, idx, error = msg
+                self._loop.call_soon_threadsafe(self._mark_dead, idx, error)
+                continue
+            self._loop.call_soon_threadsafe(self._resolve, *msg)
+
+    def _watch_exits(self):
+        # プロセス終了（クラッシュ・OOM kill 等）を検知して処理中の要求を失敗させる
+        alive = {p.sentinel: i for i, p in enumerate(self._procs)}
+        while alive:
+            for handle in wait_handles(list(alive)):
+                idx = alive.pop(handle)
+                if self._closing:
+                    continue
+                self._procs[idx].join(timeout=1.0)
+                code = self._procs[idx].exitcode
+                try:
+                    self._loop.call_soon_threadsafe(self._mark_dead, idx, f"worker replica {idx} exited (code={code})")
+                except RuntimeError:
+                    return  # イベントループ終了後
+
+    def _mark_dead(self, idx: int, error: str):
+        if self._errors[idx] is None:
+            self._errors[idx] = error
+        for req_id in [r for r, (_, i, _) in self._pending.items() if i == idx]:
+            self._fail(req_id, RuntimeError(self._errors[idx]))
+
+    def _finish(self, req_id: int):
+        entry = self._pending.pop(req_id, None)
+        if entry is None:
+            return None
+        fut, idx, shm = entry
+        self._inflight[idx] -= 1
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+        return fut if not fut.done() else None
+
+    def _fail(self, req_id: int, error: Exception):
+        fut = self._finish(req_id)
+        if fut is not None:
+            fut.set_exception(error)
+
+    def _resolve(self, req_id: int, ok: bool, result):
+        entry = self._pending.get(req_id)
+        if entry is None:
+            return
+        self._processed[entry[1]] += 1
+        fut = self._finish(req_id)
+        if fut is None:
+            return
+        if ok:
+            fut.set_result(result)
+        else:
+            fut.set_exception(RuntimeError(result))
+
+    def _live(self) -> List[int]:
+        return [i for i in range(self.replicas) if self._errors[i] is None and self._procs[i].is_alive()]
+
+    def _pick(self) -> int:
+        live = self._live()
+        if not live:
+            raise RuntimeError("no live worker replica: " + "; ".join(e for e in self._errors if e))
+        return min(live, key=lambda i: self._inflight[i])
+
+    def _submit(self, idx: int, op: str, payload, shm=None, timeout: Optional[float] = None) -> asyncio.Future:
+        fut = self._loop.create_future()
+        if self._errors[idx] is not None:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            fut.set_exception(RuntimeError(self._errors[idx]))
+            return fut
+        req_id = next(self._ids)
+        self._pending[req_id] = (fut, idx, shm)
+        self._inflight[idx] += 1
+        self._req_qs[idx].put((op, req_id, payload))
+        if timeout:
+            # 期限切れで打ち切る（遅れて届いた結果は _resolve で捨てる）
+            handle = self._loop.call_later(
+                timeout, self._fail, req_id, TimeoutError(f"worker replica {idx}: {op} timed out after {timeout}s")
+            )
+            fut.add_done_callback(lambda _: handle.cancel())
+        return fut
+
+    async def load_whisper(self, engine: str, model_dir: str, options: dict, max_resident: int = 1):
+        """
+        全レプリカに Whisper モデルのロードを1台ずつ指示する（ローリング切替）。
+        ロード中のレプリカは処理中件数が増えるため、least-loaded で他レプリカへ振り分けられる。
+        """
+        for i in self._live():
+            await self._submit(i, "load_whisper", (engine, model_dir, options, max_resident))
+
+    async def wait_ready(self):
+        """全レプリカが起動時ロード（TTS のロード・ウォームアップ）を終えるまで待つ（失敗したら例外）"""
+        await asyncio.gather(*[self._submit(i, "ping", None) for i in range(self.replicas)])
+
+    async def transcribe_batch(self, audios: List[np.ndarray]) -> List[dict]:
+        offsets = [0]
+        for a in audios:
+            offsets.append(offsets[-1] + len(a))
+        idx = self._pick()
+        shm = shared_memory.SharedMemory(create=True, size=max(offsets[-1], 1) * 4)
+        buf = np.ndarray((offsets[-1],), dtype=np.float32, buffer=shm.buf)
+        for a, b in zip(audios, offsets[:-1]):
+            buf[b:b + len(a)] = a
+        del buf
+        return await self._submit(idx, "transcribe", (shm.name, offsets), shm=shm,
+                                  timeout=self.request_timeout_sec)
+
+    async def synthesize(self, text: str) -> bytes:
+        return await self._submit(self._pick(), "synthesize", text, timeout=self.request_timeout_sec)
+
+    def stats(self) -> List[dict]:
+        return [
+            {
+                "replica": i,
+                "alive": p.is_alive() and self._errors[i] is None,
+                "error": self._errors[i],
+                "queue_depth": self._inflight[i],
+                "processed": self._processed[i],
+            }
+            for i, p in enumerate(self._procs)
+        ]
+
+    def shutdown(self):
+        self._closing = True
+        for q in self._req_qs:
+            q.put(None)
+        for p in self._procs:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.kill()
+        if self._res_q is not None:
+            self._res_q.put(None)
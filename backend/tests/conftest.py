@@ -0,0 +1,6 @@
+# backend/tests/conftest.py
+import os
+import sys
+
+# アプリと同じく backend/ をルートに models.* / utils.* を import する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
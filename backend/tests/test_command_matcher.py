@@ -0,0 +1,44 @@
+# backend/tests/test_command_matcher.py
+from utils.command_matcher import CommandMatcher, normalize_kana
+
+
+def matcher(*phrases_per_command):
+    return CommandMatcher([
+        {"type": f"cmd{i}", "phrases": list(phrases)} for i, phrases in enumerate(phrases_per_command)
+    ])
+
+
+def test_normalize_kana_absorbs_script_width_and_punctuation():
+    assert normalize_kana("ﾓｰﾄﾞ、ヘンコウ！") == normalize_kana("もーど へんこう")
+    assert normalize_kana("ＡＢＣ。") == "abc"
+
+
+def test_match_through_failure_link():
+    # "abcd" の途中で外れても、failure link で "bc" に移って検出する
+    m = matcher(["abcd"], ["bc"])
+    assert m.search("xabce") == {"type": "cmd1"}
+    assert m.search("abcd") == {"type": "cmd1"}  # "bc" の方が先に終わる
+
+
+def test_output_inherited_from_failure_target():
+    # "she" の終端は failure 先 "he" の出力も持つ
+    m = matcher(["he"], ["she"], ["hers"])
+    assert m.search("ushers") == {"type": "cmd1"}
+    assert m.search("xhex") == {"type": "cmd0"}
+
+
+def test_longest_phrase_wins_at_same_end():
+    m = matcher(["わり"], ["おわり"])
+    assert m.search("これでおわり") == {"type": "cmd1"}
+
+
+def test_first_occurrence_wins():
+    m = matcher(["さようなら"], ["ばいばい"])
+    assert m.search("バイバイ、さようなら") == {"type": "cmd1"}
+
+
+def test_kana_variants_and_no_match():
+    m = CommandMatcher([{"type": "go_home", "mode": None, "phrases": ["ホームに戻る"]}])
+    assert m.search("えっと、ほーむに戻る。") == {"type": "go_home", "mode": None}
+    assert m.search("ホームページ") is None
+    assert m.search("") is None
@@ -0,0 +1,89 @@
+# backend/tests/test_reply_tasks.py
+import asyncio
+import os
+import warnings
+
+import pytest
+
+from utils.admission import InflightLimiter
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="module")
+def app_module():
+    # app.py は prompts.yaml をリポジトリルートからの相対パスで読む（モデルはロードしない）
+    os.environ.setdefault("OPENAI_API_KEY", "test-dummy")
+    os.environ["MODEL_WORKER_REPLICAS"] = "0"
+    cwd = os.getcwd()
+    os.chdir(REPO_ROOT)
+    try:
+        import app
+    finally:
+        os.chdir(cwd)
+    return app
+
+
+class RecordingWS:
+    def __init__(self):
+        self.sent = []
+
+    async def send_json(self, frame):
+        await asyncio.sleep(0)  # 実際の送信と同じくイベントループに制御を返す
+        self.sent.append(frame)
+
+
+def open_session(app_module, sid=1):
+    app_module.sessions[sid] = {"token": "test-session", "reply_task": None, "reply_lock": asyncio.Lock()}
+    return sid
+
+
+def test_cancelled_before_start_releases_reply_slot(app_module):
+    async def scenario():
+        ws, sid = RecordingWS(), open_session(app_module)
+        limiter = InflightLimiter("replies", 1)
+        started = []
+
+        async def reply(n):
+            started.append(n)
+
+        # 1件目のタスクが一度も実行されないうちに2件目が取り消す
+        await app_module.start_reply(ws, sid, reply(1), limiter=limiter)
+        await app_module.start_reply(ws, sid, reply(2), limiter=limiter)
+        await app_module.sessions[sid]["reply_task"]
+        return ws, limiter, started
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", RuntimeWarning)  # never awaited の警告も失敗扱い
+        ws, limiter, started = asyncio.run(scenario())
+    app_module.sessions.clear()
+
+    assert started == [2]
+    assert limiter.in_flight == 0
+    assert not any(f["type"] == "busy" for f in ws.sent)
+
+
+def test_overlapping_start_reply_keeps_one_tracked_reply(app_module):
+    async def scenario():
+        ws, sid = RecordingWS(), open_session(app_module)
+        finished = []
+
+        async def reply(n):
+            await asyncio.sleep(0.05)
+            finished.append(n)
+
+        # ASR タスクと受信ループから同時に応答を開始する
+        await asyncio.gather(
+            app_module.start_reply(ws, sid, reply(1)),
+            app_module.start_reply(ws, sid, reply(2)),
+        )
+        tracked = app_module.sessions[sid]["reply_task"]
+        others = asyncio.all_tasks() - {asyncio.current_task(), tracked}
+        await tracked
+        return finished, others
+
+    finished, others = asyncio.run(scenario())
+    app_module.sessions.clear()
+
+    assert finished == [2]
+    assert not others
@@ -0,0 +1,71 @@
+# backend/tests/test_streaming_asr.py
+import asyncio
+
+import numpy as np
+
+from models.streaming_asr import StreamingTranscript
+
+SR = 16000
+WORD_SEC = 0.5
+
+
+class ScriptedWhisper:
+    """
+    台本どおりに認識する擬似 ASR。音声の値に発話先頭からのサンプル位置を入れておき、
+    渡された tail の範囲に収まる語だけを（tail 先頭からの）タイムスタンプ付きで返す。
+    """
+    def __init__(self, segments):
+        self.segments = segments  # 0.5 秒ごとに1セグメントのテキスト
+        self.calls = []
+
+    async def transcribe_detailed(self, audio, best_effort=False):
+        start = int(audio[0]) if len(audio) else 0
+        end = start + len(audio)
+        self.calls.append((start, end))
+        segs = []
+        for i, text in enumerate(self.segments):
+            s, e = int(i * WORD_SEC * SR), int((i + 1) * WORD_SEC * SR)
+            if s >= start and e <= end:
+                segs.append(((s - start) / SR, (e - start) / SR, text))
+        return {"text": "".join(t for _, _, t in segs).strip(), "segments": segs}
+
+
+def run_utterance(stream, whisper):
+    total = int(len(whisper.segments) * WORD_SEC * SR)
+    audio = np.arange(total, dtype=np.float32)
+    partials = []
+
+    async def main():
+        for n in range(int(WORD_SEC * SR), total + 1, int(WORD_SEC * SR)):
+            partials.append(await stream.update(audio[:n]))
+        return await stream.finalize(audio)
+
+    return asyncio.run(main()), partials
+
+
+def test_english_segments_are_trimmed():
+    whisper = ScriptedWhisper([" Hello", " world,", " this", " is", " a", " test."])
+    stream = StreamingTranscript(whisper, sample_rate=SR)
+    final, partials = run_utterance(stream, whisper)
+    assert final == "Hello world, this is a test."
+    # 確定済みの語の音声は再認識しない（tail の先頭が進んでいく）
+    assert max(start for start, _ in whisper.calls) > 0
+    assert partials[-1][0].startswith("Hello world,")
+
+
+def test_japanese_stays_in_char_mode_when_hypothesis_has_space():
+    whisper = ScriptedWhisper(["今日は", "いい", "天気ですね", " 明日は 雨"])
+    stream = StreamingTranscript(whisper, sample_rate=SR)
+    final, partials = run_utterance(stream, whisper)
+    assert final == "今日はいい天気ですね明日は雨"
+    assert max(start for start, _ in whisper.calls) > 0
+    assert all(" " not in full for _, full in partials)
+
+
+def test_language_fixes_mode():
+    whisper = ScriptedWhisper(["今日は", " OK", "です"])
+    final, _ = run_utterance(StreamingTranscript(whisper, sample_rate=SR, language="ja"), whisper)
+    assert final == "今日はOKです"
+    whisper = ScriptedWhisper([" Hello", " world"])
+    final, _ = run_utterance(StreamingTranscript(whisper, sample_rate=SR, language="en"), whisper)
+    assert final == "Hello world"
@@ -0,0 +1,139 @@
+# backend/utils/admission.py
+import asyncio
+import time
+from collections import Counter, deque
+from typing import Deque, Optional, Tuple
+
+AUDIO_QUEUE_POLICIES = ("block", "drop", "merge")
+
+
+class ServerBusyError(Exception):
+    """サーバ全体の上限に達したため受け付けない（クライアントには busy フレームで通知）"""
+    def __init__(self, scope: str, retry_after_ms: int):
+        super().__init__(f"server busy: {scope}")
+        self.scope = scope
+        self.retry_after_ms = retry_after_ms
+
+
+class InflightLimiter:
+    """
+    サーバ全体の同時実行数の上限（limit <= 0 で無制限）。
+    上限に達していたら待たずに ServerBusyError を送出する（待ち行列を作らず、遅延を全員に波及させない）。
+    """
+    def __init__(self, scope: str, limit: int, retry_after_ms: int = 2000):
+        self.scope = scope
+        self.limit = limit
+        self.retry_after_ms = retry_after_ms
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def acquire(self):
+        if self.limit > 0 and self.in_flight >= self.limit:
+            self.rejected += 1
+            raise ServerBusyError(self.scope, self.retry_after_ms)
+        self.in_flight += 1
+        self.admitted += 1
+
+    def release(self):
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+class AudioInbox:
+    """
+    受信ループ → ASR タスク間のセッション別音声キュー。
+    get() は溜まっているチャンクをすべて結合して返すため、遅れたセッションはデコード・VAD・partial を
+    1回にまとめて追いつく。件数が max_chunks に達したときの put の挙動は policy で選ぶ:
+      - "merge": 既存分を1件に結合して受け付ける（受信を止めず、音声も失わない）
+      - "block": 空くまで put を待たせる（受信ループが止まり、TCP でクライアントへ背圧がかかる）
+      - "drop":  最も古いチャンクを捨てる（途中から復号できる PCM 等のみ。webm/opus では使わない）
+    未処理の合計が max_bytes（0 で無制限）を超える場合、block は待ち、drop は古い順に捨て、
+    merge は途中を捨てられないので ServerBusyError で受け付けを断る（呼び出し側で接続を張り直させる）。
+    捨てた・結合した・断ったチャンク数は dropped / merged / refused に数え、totals（全セッション共有の
+    Counter。切断後も残る）にも加算する。
+    """
+    def __init__(self, max_chunks: int = 64, policy: str = "merge", max_bytes: int = 0,
+                 retry_after_ms: int = 2000, totals: Optional[Counter] = None):
+        self.max_chunks = max(1, max_chunks)
+        self.max_bytes = max_bytes
+        self.retry_after_ms = retry_after_ms
+        self.set_policy(policy)
+        self._chunks: Deque[Tuple[bytes, float]] = deque()
+        self._bytes = 0
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self.totals = totals if totals is not None else Counter()
+        self.dropped = 0
+        self.merged = 0
+        self.refused = 0
+
+    def _count(self, name: str):
+        setattr(self, name, getattr(self, name) + 1)
+        self.totals[name] += 1
+
+    def set_policy(self, policy: str):
+        """入力形式が決まった時点で切り替える（drop は PCM 入力のときだけ使う）"""
+        if policy not in AUDIO_QUEUE_POLICIES:
+            raise ValueError(f"unknown audio queue policy: {policy}")
+        self.policy = policy
+
+    def _over_bytes(self, n: int) -> bool:
+        return bool(self.max_bytes) and bool(self._chunks) and self._bytes + n > self.max_bytes
+
+    async def put(self, chunk: bytes):
+        if self.policy == "block":
+            while len(self._chunks) >= self.max_chunks or self._over_bytes(len(chunk)):
+                self._writable.clear()
+                await self._writable.wait()
+        elif self.policy == "drop":
+            while len(self._chunks) >= self.max_chunks or self._over_bytes(len(chunk)):
+                self._bytes -= len(self._chunks.popleft()[0])
+                self._count("dropped")
+        else:
+            if self._over_bytes(len(chunk)):
+                self._count("refused")
+                raise ServerBusyError("audio", self.retry_after_ms)
+            if len(self._chunks) >= self.max_chunks:
+                self._chunks = deque([self._join()])
+                self._count("merged")
+        self._chunks.append((chunk, time.perf_counter()))
+        self._bytes += len(chunk)
+        self._readable.set()
+
+    def _join(self) -> Tuple[bytes, float]:
+        # 到着時刻は最も古いチャンクのもの（遅延の計測用）
+        return b"".join(c for c, _ in self._chunks), self._chunks[0][1]
+
+    async def get(self) -> Tuple[bytes, float]:
+        """溜まっている全チャンクを結合して (バイト列, 最古の到着時刻) を返す"""
+        while not self._chunks:
+            self._readable.clear()
+            await self._readable.wait()
+        item = self._join() if len(self._chunks) > 1 else self._chunks[0]
+        self._chunks.clear()
+        self._bytes = 0
+        self._writable.set()
+        return item
+
+    def lag(self) -> float:
+        """最も古い未処理チャンクの待ち時間（秒）"""
+        return time.perf_counter() - self._chunks[0][1] if self._chunks else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "policy": self.policy,
+            "pending": len(self._chunks),
+            "pending_bytes": self._bytes,
+            "dropped": self.dropped,
+            "merged": self.merged,
+            "refused": self.refused,
+        }
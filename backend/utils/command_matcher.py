@@ -0,0 +1,95 @@
+# backend/utils/command_matcher.py
+import re
+import unicodedata
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+try:
+    import pykakasi  # 任意依存（あれば漢字も読み仮名に揃えて照合）
+    _KAKASI = pykakasi.kakasi()
+except Exception:
+    _KAKASI = None
+
+# 照合時に無視する文字（空白・句読点・記号・長音）
+_IGNORED = re.compile(r"[\s、。，．,.!?！？・「」『』（）()\-ー〜~]")
+
+
+def normalize_kana(text: str) -> str:
+    """
+    コマンド照合用の正規化。NFKC → (pykakasi があれば読みへ変換) → カタカナをひらがなへ → 記号・長音除去。
+    ASR の表記揺れ（カタカナ/ひらがな、全角/半角、句読点の有無）を吸収する。
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    if _KAKASI is not None:
+        text = "".join(item["hira"] for item in _KAKASI.convert(text))
+    text = "".join(
+        chr(ord(c) - 0x60) if "ァ" <= c <= "ヶ" else c
+        for c in text
+    )
+    return _IGNORED.sub("", text)
+
+
+class CommandMatcher:
+    """
+    音声コマンドの Aho-Corasick オートマトン。起動時に一度だけ構築し、
+    テキスト長に比例する1パスで全フレーズを同時に探索する（partial にもそのまま使える）。
+    commands: [{"type": ..., "mode": ..., "phrases": [...]}, ...]
+    """
+    def __init__(self, commands: List[Dict[str, Any]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self._actions: List[Dict[str, Any]] = []
+        self._lengths: List[int] = []
+        for cmd in commands:
+            action = {k: v for k, v in cmd.items() if k != "phrases"}
+            for phrase in cmd.get("phrases", []):
+                key = normalize_kana(phrase)
+                if key:
+                    self._add(key, action)
+        self._build()
+
+    @classmethod
+    def from_config(cls, prompts: Dict[str, Any]) -> "CommandMatcher":
+        return cls(prompts.get("commands", []))
+
+    def _add(self, key: str, action: Dict[str, Any]):
+        node = 0
+        for c in key:
+            nxt = self._goto[node].get(c)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][c] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(len(self._actions))
+        self._actions.append(action)
+        self._lengths.append(len(key))
+
+    def _build(self):
+        # BFS で failure link を張り、出力を failure 先から継承
+        q = deque(self._goto[0].values())
+        while q:
+            node = q.popleft()
+            for c, nxt in self._goto[node].items():
+                q.append(nxt)
+                f = self._fail[node]
+                while f and c not in self._goto[f]:
+                    f = self._fail[f]
+                link = self._goto[f].get(c, 0)
+                self._fail[nxt] = link if link != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def search(self, text: str) -> Optional[Dict[str, Any]]:
+        """最初に出現したコマンド（同じ終端位置なら最長一致）を返す"""
+        node = 0
+        for c in normalize_kana(text):
+            while node and c not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(c, 0)
+            if self._out[node]:
+                best = max(self._out[node], key=lambda i: self._lengths[i])
+                return dict(self._actions[best])
+        return None
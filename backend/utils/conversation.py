@@ -0,0 +1,103 @@
+# backend/utils/conversation.py
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+
+try:
+    import tiktoken  # 任意依存（無ければ概算）
+    _ENCODER = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _ENCODER = None
+
+
+def count_tokens(text: str) -> int:
+    """トークン数。tiktoken が無い場合は ASCII 4文字≒1、非ASCII 1文字≒1 で概算"""
+    if _ENCODER is not None:
+        return len(_ENCODER.encode(text))
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return (len(text) - ascii_chars) + (ascii_chars + 3) // 4
+
+
+# 要約関数: (これまでの要約, 畳み込むターン) → 新しい要約
+Summarizer = Callable[[str, List[Dict[str, str]]], Awaitable[str]]
+
+
+class ConversationHistory:
+    """
+    モードごとの会話履歴。直近のターンはトークン予算内で保持し、
+    溢れた古いターンはローリング要約へ畳み込む（要約はバックグラウンドで差分更新）。
+    - max_tokens: 直近ターンの合計がこれを超えたら畳み込み開始
+    - keep_tokens: 畳み込み後に残す直近ターンの目安
+    """
+    def __init__(self, max_tokens: int = 3000, keep_tokens: int = 1500):
+        self.max_tokens = max_tokens
+        self.keep_tokens = min(keep_tokens, max_tokens)
+        self.summary = ""
+        self._turns: List[Dict[str, str]] = []
+        self._tokens: List[int] = []
+        # 要約へ畳み込み中のターン（要約完了までは履歴として送る）
+        self._folding: List[Dict[str, str]] = []
+        self._fold_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    @property
+    def token_count(self) -> int:
+        return sum(self._tokens)
+
+    def append(self, role: str, content: str):
+        self._turns.append({"role": role, "content": content})
+        self._tokens.append(count_tokens(content))
+
+    def clear(self):
+        if self._fold_task and not self._fold_task.done():
+            self._fold_task.cancel()
+        self.summary = ""
+        self._turns.clear()
+        self._tokens.clear()
+        self._folding = []
+
+    def to_dict(self) -> Dict:
+        # 畳み込み中のターンは未要約なので履歴側に含めて保存
+        return {"summary": self.summary, "turns": self._folding + self._turns}
+
+    def restore(self, data: Dict):
+        self.clear()
+        self.summary = data.get("summary", "")
+        for t in data.get("turns", []):
+            self.append(t["role"], t["content"])
+
+    def messages(self, system_prompt: str) -> List[Dict[str, str]]:
+        msgs = [{"role": "system", "content": system_prompt}]
+        if self.summary:
+            msgs.append({"role": "system", "content": f"これまでの会話の要約:\n{self.summary}"})
+        return msgs + self._folding + self._turns
+
+    def maybe_fold(self, summarize: Summarizer) -> Optional[asyncio.Task]:
+        """予算超過かつ畳み込み中でなければ、古いターンの要約をバックグラウンドで開始"""
+        if self.token_count <= self.max_tokens:
+            return None
+        if self._fold_task and not self._fold_task.done():
+            return None
+        total = self.token_count
+        n = 0
+        while n < len(self._turns) - 1 and total > self.keep_tokens:
+            total -= self._tokens[n]
+            n += 1
+        if n == 0:
+            return None
+        self._folding = self._turns[:n]
+        del self._turns[:n]
+        del self._tokens[:n]
+        self._fold_task = asyncio.create_task(self._fold(summarize))
+        return self._fold_task
+
+    async def _fold(self, summarize: Summarizer):
+        try:
+            self.summary = await summarize(self.summary, self._folding)
+            self._folding = []
+        except Exception:
+            # 要約に失敗した場合は畳み込み対象を履歴に戻す（次回再試行）
+            self._turns[:0] = self._folding
+            self._tokens[:0] = [count_tokens(t["content"]) for t in self._folding]
+            self._folding = []
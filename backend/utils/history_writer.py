@@ -0,0 +1,243 @@
+# backend/utils/history_writer.py
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+
+class HistoryWriter(ABC):
+    """
+    会話ログ（発話・応答の1行ずつ）の非同期ライタ。
+    write はメモリ上のキューに積むだけで、バックグラウンドタスクが flush_interval ごと
+    （または batch_size 件たまった時点）にまとめて書き出す。ファイル I/O は専用の1スレッドで
+    実行するため、ストレージが遅くても WebSocket ループは止まらない。
+    ファイルサイズ（max_bytes）または経過時間（max_age_sec）を超えたらリネームしてローテーションする。
+    書き込みに失敗し続けても未書き込みは max_pending 件までしか持たず、超えた分は古い順に捨てる（dropped）。
+    複数ワーカーで同じ path に書く場合、他のワーカーがローテーションしたこと（path の inode が
+    開いているファイルと違う）を書き込み前に検出して開き直し、古いファイルへ書き続けない。
+    """
+    def __init__(
+        self,
+        path: str,
+        flush_interval_sec: float = 1.0,
+        batch_size: int = 256,
+        max_bytes: int = 0,
+        max_age_sec: float = 0.0,
+        max_pending: int = 10000,
+    ):
+        self.path = path
+        self.flush_interval_sec = flush_interval_sec
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.max_age_sec = max_age_sec
+        self.max_pending = max(1, max_pending)
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-writer")
+        self._pending: List[Dict[str, Any]] = []
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._opened_at = 0.0
+        self._ino: Optional[int] = None  # 開いているファイルの inode
+        self.records = 0
+        self.batches = 0
+        self.rotations = 0
+        self.errors = 0
+        self.dropped = 0
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._io, fn, *args)
+
+    async def start(self):
+        await self._run(self._open)
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval_sec)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def write(self, role: str, text: str, **fields):
+        """1件を書き込み予約（ブロックしない）"""
+        self._pending.append({
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "role": role,
+            "text": text,
+            **fields,
+        })
+        self._trim_pending()
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    def _trim_pending(self):
+        excess = len(self._pending) - self.max_pending
+        if excess > 0:
+            del self._pending[:excess]
+            self.dropped += excess
+
+    async def flush(self):
+        """キューの内容を1回の書き込み（1回の fsync / 1トランザクション）で書き出す"""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        try:
+            await self._run(self._write_batch, batch)
+        except Exception:
+            # 書けなかった分は次回に回す（ログのために会話を止めない）
+            self.errors += 1
+            self._pending = batch + self._pending
+            self._trim_pending()
+            return
+        self.records += len(batch)
+        self.batches += 1
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        if self._replaced():
+            self._reopen()
+        elif self._should_rotate():
+            self._rotate()
+        self._append(batch)
+
+    def _opened(self, ino: int):
+        # 各バックエンドの _open の最後に呼ぶ
+        self._ino = ino
+        self._opened_at = time.time()
+
+    def _replaced(self) -> bool:
+        """path が別のファイルに置き換わった（他のワーカーがローテーションした）か"""
+        try:
+            return os.stat(self.path).st_ino != self._ino
+        except FileNotFoundError:
+            return True
+
+    def _reopen(self):
+        self._close_file()
+        self._open()
+
+    def _should_rotate(self) -> bool:
+        if self.max_age_sec and time.time() - self._opened_at >= self.max_age_sec:
+            return True
+        if self.max_bytes:
+            try:
+                return os.path.getsize(self.path) >= self.max_bytes
+            except OSError:
+                return False
+        return False
+
+    def _rotate(self):
+        self._close_file()
+        # 同時に他のワーカーがローテーション済みなら、その新しいファイルはリネームしない
+        if os.path.exists(self.path) and not self._replaced():
+            base, ext = os.path.splitext(self.path)
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            dst, n = f"{base}.{stamp}{ext}", 1
+            while os.path.exists(dst):
+                dst, n = f"{base}.{stamp}-{n}{ext}", n + 1
+            os.replace(self.path, dst)
+            self.rotations += 1
+        self._open()
+
+    # ---- バックエンド固有（専用スレッドから呼ばれる） ----
+    @abstractmethod
+    def _open(self):
+        ...
+
+    @abstractmethod
+    def _append(self, batch: List[Dict[str, Any]]):
+        ...
+
+    def _close_file(self):
+        pass
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+        await self.flush()
+        await self._run(self._close_file)
+        self._io.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "pending": len(self._pending),
+            "records": self.records,
+            "batches": self.batches,
+            "rotations": self.rotations,
+            "errors": self.errors,
+            "dropped": self.dropped,
+        }
+
+
+class JsonlHistoryWriter(HistoryWriter):
+    """1行1レコードの JSONL。ファイルは開いたままにし、バッチごとに1回だけ fsync する"""
+    def __init__(self, path: str, **kwargs):
+        super().__init__(path, **kwargs)
+        self._fh = None
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._fh = open(self.path, "a", encoding="utf-8")
+        self._opened(os.fstat(self._fh.fileno()).st_ino)
+
+    def _append(self, batch: List[Dict[str, Any]]):
+        self._fh.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in batch))
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def _close_file(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def stats(self) -> dict:
+        return {"backend": "jsonl", **super().stats()}
+
+
+class SQLiteHistoryWriter(HistoryWriter):
+    """SQLite(WAL)。バッチごとに1トランザクションで executemany する"""
+    def __init__(self, path: str, **kwargs):
+        super().__init__(path, **kwargs)
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, ts TEXT NOT NULL, session TEXT,"
+            " mode TEXT, role TEXT NOT NULL, text TEXT NOT NULL)"
+        )
+        conn.commit()
+        self._conn = conn
+        self._opened(os.stat(self.path).st_ino)
+
+    def _append(self, batch: List[Dict[str, Any]]):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO history (ts, session, mode, role, text) VALUES (?, ?, ?, ?, ?)",
+                [(r["ts"], r.get("session"), r.get("mode"), r["role"], r["text"]) for r in batch],
+            )
+
+    def _close_file(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def stats(self) -> dict:
+        return {"backend": "sqlite", **super().stats()}
+
+
+def create_history_writer(kind: str, path: str, **kwargs) -> HistoryWriter:
+    if kind == "jsonl":
+        return JsonlHistoryWriter(path, **kwargs)
+    if kind == "sqlite":
+        return SQLiteHistoryWriter(path, **kwargs)
+    raise ValueError(f"unknown history backend: {kind}")
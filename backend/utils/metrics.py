@@ -0,0 +1,130 @@
+# backend/utils/metrics.py
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 秒単位のバケット（数ms〜数十秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+trace_logger = logging.getLogger("voicechat.trace")
+
+
+def _fmt_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{str(v)}"' for k, v in sorted(labels.items()))
+    return "{" + inner + "}"
+
+
+class Histogram:
+    """
+    Prometheus 形式のヒストグラム（累積バケット・sum・count）に加え、
+    直近 reservoir 件から p50/p95/p99 を算出して quantile 系列としても出力する。
+    """
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 buckets=DEFAULT_BUCKETS, reservoir: int = 2048):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self.reservoir = reservoir
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple, dict] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = {
+                    "counts": [0] * len(self.buckets), "sum": 0.0, "count": 0,
+                    "recent": deque(maxlen=self.reservoir),
+                }
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    s["counts"][i] += 1
+            s["sum"] += value
+            s["count"] += 1
+            s["recent"].append(value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        q_lines = [f"# HELP {self.name}_quantile {self.help} (recent window)",
+                   f"# TYPE {self.name}_quantile gauge"]
+        with self._lock:
+            for key, s in sorted(self._series.items()):
+                labels = dict(zip(self.labelnames, key))
+                for b, c in zip(self.buckets, s["counts"]):
+                    lines.append(f"{self.name}_bucket{_fmt_labels({**labels, 'le': b})} {c}")
+                lines.append(f"{self.name}_bucket{_fmt_labels({**labels, 'le': '+Inf'})} {s['count']}")
+                lines.append(f"{self.name}_sum{_fmt_labels(labels)} {s['sum']}")
+                lines.append(f"{self.name}_count{_fmt_labels(labels)} {s['count']}")
+                recent = sorted(s["recent"])
+                for q in QUANTILES:
+                    if recent:
+                        v = recent[min(len(recent) - 1, int(q * len(recent)))]
+                        q_lines.append(f"{self.name}_quantile{_fmt_labels({**labels, 'quantile': q})} {v}")
+        return lines + q_lines
+
+
+class Gauge:
+    """スクレイプ時にコールバックで値を取得するゲージ"""
+    def __init__(self, name: str, help: str, fn: Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        try:
+            value = float(self.fn())
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Histogram:
+        if name not in self._metrics:
+            self._metrics[name] = Histogram(name, help, labelnames)
+        return self._metrics[name]
+
+    def gauge(self, name: str, help: str, fn: Callable[[], float]) -> Gauge:
+        self._metrics[name] = Gauge(name, help, fn)
+        return self._metrics[name]
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics.values():
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+STAGE_SECONDS = registry.histogram(
+    "voicechat_stage_seconds", "Per-stage latency in seconds", ("stage",)
+)
+# 有効時はステージごとの所要時間をトレースIDつきでログ出力
+TRACE_ENABLED = False
+
+
+def observe(stage: str, seconds: float, trace_id: Optional[str] = None):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if TRACE_ENABLED and trace_id:
+        trace_logger.info("trace=%s stage=%s seconds=%.4f", trace_id, stage, seconds)
+
+
+@contextmanager
+def timed(stage: str, trace_id: Optional[str] = None):
+    """with ブロックの所要時間を stage として記録（await を含むブロックでも可）"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - t0, trace_id)
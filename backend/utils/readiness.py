@@ -0,0 +1,61 @@
+# backend/utils/readiness.py
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+
+class Readiness:
+    """
+    起動時のコンポーネント別ロード状況（/api/ready 用）。
+    各コンポーネントは pending → loading → ready / error と遷移し、所要時間を記録する。
+    全コンポーネントが終わる（ready か error）と done が立つ。
+    """
+    def __init__(self, components: Iterable[str]):
+        self._state: Dict[str, dict] = {
+            name: {"status": "pending", "load_sec": None, "error": None} for name in components
+        }
+        self._started = time.monotonic()
+        self._finished: Optional[float] = None
+        self.done = asyncio.Event()
+
+    async def run(self, name: str, fn: Callable[[], Awaitable[Optional[str]]]) -> bool:
+        """
+        fn を実行して name の状態を更新。例外は error として記録し送出しない。
+        fn が文字列を返した場合は致命的でない警告として記録する（status は ready）。
+        """
+        state = self._state[name]
+        state.update(status="loading", load_sec=None, error=None)
+        state.pop("warning", None)
+        t0 = time.monotonic()
+        try:
+            warning = await fn()
+        except Exception as e:
+            state.update(status="error", error=f"{type(e).__name__}: {e}")
+        else:
+            state["status"] = "ready"
+            if warning:
+                state["warning"] = warning
+        state["load_sec"] = round(time.monotonic() - t0, 3)
+        self._check_done()
+        return state["status"] == "ready"
+
+    def skip(self, name: str, reason: str):
+        """前提コンポーネントの失敗などで実行しなかったもの"""
+        self._state[name].update(status="error", error=reason)
+        self._check_done()
+
+    def _check_done(self):
+        if all(s["status"] in ("ready", "error") for s in self._state.values()) and not self.done.is_set():
+            self._finished = time.monotonic()
+            self.done.set()
+
+    def ready(self) -> bool:
+        return all(s["status"] == "ready" for s in self._state.values())
+
+    def snapshot(self) -> dict:
+        end = self._finished if self._finished is not None else time.monotonic()
+        return {
+            "ready": self.ready(),
+            "elapsed_sec": round(end - self._started, 3),
+            "components": {name: dict(s) for name, s in self._state.items()},
+        }
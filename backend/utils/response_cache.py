@@ -0,0 +1,114 @@
+# backend/utils/response_cache.py
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from models.tts_cache import normalize_text
+
+
+def _trigrams(text: str) -> set:
+    if len(text) < 3:
+        return {text} if text else set()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def similarity(a: str, b: str) -> float:
+    """文字 trigram の Jaccard 係数（0〜1）"""
+    ta, tb = _trigrams(a), _trigrams(b)
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+class ResponseCache:
+    """
+    LLM 応答（テキスト＋文単位の合成音声）のキャッシュ。
+    キーは (モデル, モード, システムプロンプト, 正規化した直近の文脈)。TTL と件数上限の LRU で管理。
+    near_duplicate_threshold を指定すると、完全一致しない場合に同一バケット内で
+    文脈の類似度がしきい値以上のエントリも返す。
+    """
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_sec: float = 3600.0,
+        near_duplicate_threshold: Optional[float] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.near_duplicate_threshold = near_duplicate_threshold
+        # key → (bucket, context, created, entry)
+        self._items: "OrderedDict[str, Tuple[str, str, float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _bucket(model: str, mode: str, system_prompt: str) -> str:
+        return hashlib.sha1(f"{model}\0{mode}\0{system_prompt}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _context(messages: List[Dict[str, str]]) -> str:
+        return "\n".join(f"{m['role']}:{normalize_text(m['content'])}" for m in messages)
+
+    def _expired(self, created: float) -> bool:
+        return time.monotonic() - created > self.ttl_sec
+
+    def get(
+        self, model: str, mode: str, system_prompt: str, context: List[Dict[str, str]]
+    ) -> Optional[Dict[str, Any]]:
+        bucket = self._bucket(model, mode, system_prompt)
+        ctx = self._context(context)
+        key = hashlib.sha1(f"{bucket}\0{ctx}".encode("utf-8")).hexdigest()
+        item = self._items.get(key)
+        if item is not None and not self._expired(item[2]):
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[3]
+        if item is not None:
+            del self._items[key]
+
+        if self.near_duplicate_threshold is not None:
+            best_key, best_score = None, self.near_duplicate_threshold
+            for k, (b, c, created, _) in list(self._items.items()):
+                if self._expired(created):
+                    del self._items[k]
+                    continue
+                if b != bucket:
+                    continue
+                score = similarity(ctx, c)
+                if score >= best_score:
+                    best_key, best_score = k, score
+            if best_key is not None:
+                self._items.move_to_end(best_key)
+                self.near_hits += 1
+                return self._items[best_key][3]
+
+        self.misses += 1
+        return None
+
+    def put(
+        self,
+        model: str,
+        mode: str,
+        system_prompt: str,
+        context: List[Dict[str, str]],
+        entry: Dict[str, Any],
+    ):
+        bucket = self._bucket(model, mode, system_prompt)
+        ctx = self._context(context)
+        key = hashlib.sha1(f"{bucket}\0{ctx}".encode("utf-8")).hexdigest()
+        self._items.pop(key, None)
+        self._items[key] = (bucket, ctx, time.monotonic(), entry)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.near_hits + self.misses
+        return {
+            "entries": len(self._items),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": ((self.hits + self.near_hits) / total) if total else 0.0,
+        }
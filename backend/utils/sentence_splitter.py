@@ -0,0 +1,36 @@
+# backend/utils/sentence_splitter.py
+import re
+from typing import List
+
+# 文末とみなす記号（全角/半角）と改行
+SENTENCE_END = re.compile(r"[^。！？!?．\n]*[。！？!?．\n]+[」』）)]*")
+
+
+class SentenceSplitter:
+    """
+    LLM のトークン差分を受け取り、文末記号で区切れた完成文だけを順次返す。
+    区切れていない末尾は次の feed / flush まで保持する。
+    """
+    def __init__(self, min_chars: int = 2):
+        self.min_chars = min_chars
+        self._buf = ""
+
+    def feed(self, delta: str) -> List[str]:
+        self._buf += delta
+        out = []
+        pos = 0
+        for m in SENTENCE_END.finditer(self._buf):
+            if m.end() == len(self._buf) and m.group().endswith(("!", "?")):
+                # 半角記号の直後に続きが来る可能性（"!?" など）があるので次回まで保留
+                break
+            sentence = self._buf[pos:m.end()].strip()
+            if len(sentence) >= self.min_chars:
+                out.append(sentence)
+                pos = m.end()
+        self._buf = self._buf[pos:]
+        return out
+
+    def flush(self) -> List[str]:
+        rest = self._buf.strip()
+        self._buf = ""
+        return [rest] if rest else []
@@ -0,0 +1,213 @@
+# backend/utils/session_store.py
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+
+class SessionStore(ABC):
+    """
+    セッション状態（モード・履歴）の保存先インタフェース。
+    状態は JSON 化できる dict。キーはクライアントに払い出すセッショントークン。
+    ttl_sec を過ぎても更新されなかったセッションは期限切れとして読めなくなり、定期的に削除される（0 で無期限）。
+    """
+    ttl_sec = 0.0
+
+    def _expired(self, updated_at: float, now: Optional[float] = None) -> bool:
+        return self.ttl_sec > 0 and (now or time.time()) - updated_at >= self.ttl_sec
+
+    async def start(self):
+        pass
+
+    @abstractmethod
+    async def load(self, token: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def save(self, token: str, state: Dict[str, Any]):
+        """書き込み予約（実際の永続化はバックエンド次第で遅延してよい）"""
+
+    @abstractmethod
+    async def delete(self, token: str):
+        ...
+
+    async def flush(self, token: Optional[str] = None):
+        pass
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemorySessionStore(SessionStore):
+    """プロセス内 dict。単一ワーカー・開発用"""
+    def __init__(self, ttl_sec: float = 0.0, purge_interval_sec: float = 60.0):
+        self.ttl_sec = ttl_sec
+        self.purge_interval_sec = purge_interval_sec
+        self._data: Dict[str, Tuple[str, float]] = {}  # token → (JSON, 更新時刻)
+        self._last_purge = time.time()
+        self.expired = 0
+
+    async def load(self, token: str) -> Optional[Dict[str, Any]]:
+        entry = self._data.get(token)
+        if entry is None or self._expired(entry[1]):
+            return None
+        return json.loads(entry[0])
+
+    def save(self, token: str, state: Dict[str, Any]):
+        now = time.time()
+        self._data[token] = (json.dumps(state, ensure_ascii=False), now)
+        if self.ttl_sec > 0 and now - self._last_purge >= self.purge_interval_sec:
+            self._purge(now)
+
+    def _purge(self, now: float):
+        stale = [t for t, (_, updated_at) in self._data.items() if self._expired(updated_at, now)]
+        for t in stale:
+            del self._data[t]
+        self.expired += len(stale)
+        self._last_purge = now
+
+    async def delete(self, token: str):
+        self._data.pop(token, None)
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "sessions": len(self._data), "ttl_sec": self.ttl_sec, "expired": self.expired}
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite(WAL) バックエンド。複数の uvicorn ワーカーから同じファイルを共有できる。
+    save はメモリ上の dirty 集合に入れるだけで、flush_interval ごとに1トランザクションでまとめて書く
+    （write-behind）。DB 操作は専用の1スレッドで実行しイベントループを塞がない。
+    期限切れの行は purge_interval ごとに1回の DELETE で消す（どのワーカーが消してもよい）。
+    """
+    def __init__(self, path: str, flush_interval_sec: float = 0.5, ttl_sec: float = 0.0,
+                 purge_interval_sec: float = 60.0):
+        self.path = path
+        self.flush_interval_sec = flush_interval_sec
+        self.ttl_sec = ttl_sec
+        self.purge_interval_sec = purge_interval_sec
+        self._last_purge = 0.0
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-db")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._dirty: Dict[str, str] = {}
+        self._deleted: set = set()
+        self._task: Optional[asyncio.Task] = None
+        self.writes = 0
+        self.flushes = 0
+        self.expired = 0
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " token TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+        conn.commit()
+        self._conn = conn
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._io, fn, *args)
+
+    async def start(self):
+        await self._run(self._open)
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_sec)
+            await self.flush()
+            now = time.time()
+            if self.ttl_sec > 0 and now - self._last_purge >= self.purge_interval_sec:
+                self._last_purge = now
+                self.expired += await self._run(self._purge, now - self.ttl_sec)
+
+    async def load(self, token: str) -> Optional[Dict[str, Any]]:
+        if token in self._dirty:
+            return json.loads(self._dirty[token])
+        if token in self._deleted:
+            return None
+        row = await self._run(self._select, token)
+        if row is None or self._expired(row[1]):
+            return None
+        return json.loads(row[0])
+
+    def _select(self, token: str):
+        return self._conn.execute("SELECT state, updated_at FROM sessions WHERE token = ?", (token,)).fetchone()
+
+    def _purge(self, cutoff: float) -> int:
+        with self._conn:
+            return self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,)).rowcount
+
+    def save(self, token: str, state: Dict[str, Any]):
+        self._deleted.discard(token)
+        self._dirty[token] = json.dumps(state, ensure_ascii=False)
+
+    async def delete(self, token: str):
+        self._dirty.pop(token, None)
+        self._deleted.add(token)
+
+    async def flush(self, token: Optional[str] = None):
+        """dirty な状態を1トランザクションで書き出す（token 指定時はそのセッションのみ）"""
+        if token is not None:
+            rows = {token: self._dirty.pop(token)} if token in self._dirty else {}
+            deleted = {token} & self._deleted
+        else:
+            rows, self._dirty = self._dirty, {}
+            deleted = self._deleted
+        self._deleted = self._deleted - deleted
+        if not rows and not deleted:
+            return
+        await self._run(self._write, rows, deleted)
+        self.writes += len(rows)
+        self.flushes += 1
+
+    def _write(self, rows: Dict[str, str], deleted: set):
+        now = time.time()
+        with self._conn:
+            if rows:
+                self._conn.executemany(
+                    "INSERT INTO sessions (token, state, updated_at) VALUES (?, ?, ?)"
+                    " ON CONFLICT(token) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                    [(t, s, now) for t, s in rows.items()],
+                )
+            if deleted:
+                self._conn.executemany("DELETE FROM sessions WHERE token = ?", [(t,) for t in deleted])
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+        await self.flush()
+        if self._conn is not None:
+            await self._run(self._conn.close)
+        self._io.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "pending_writes": len(self._dirty),
+            "writes": self.writes,
+            "flushes": self.flushes,
+            "ttl_sec": self.ttl_sec,
+            "expired": self.expired,
+        }
+
+
+def create_session_store(kind: str, path: str, flush_interval_sec: float = 0.5,
+                         ttl_sec: float = 0.0) -> SessionStore:
+    if kind == "sqlite":
+        return SQLiteSessionStore(path, flush_interval_sec=flush_interval_sec, ttl_sec=ttl_sec)
+    if kind == "memory":
+        return MemorySessionStore(ttl_sec=ttl_sec)
+    raise ValueError(f"unknown session store: {kind}")
@@ -4,12 +4,22 @@ import React from "react";
 import "./styles.css";
 import AutoReconnectWS from "./ws/AutoReconnectWS";
 import AudioRecorder from "./audio/AudioRecorder";
-import { playBase64Wav } from "./utils/audio";
+import PcmRecorder from "./audio/PcmRecorder";
+import { playBase64Wav, enqueueBase64Wav, playAudioBytes, enqueueAudioBytes, stopPlayback } from "./utils/audio";
 import Sidebar from "./components/Sidebar";
 import ChatView from "./components/ChatView";
 import ModelPanel from "./components/ModelPanel";
 
 const WS_URL = (location.protocol === "https:" ? "wss://" : "ws://") + location.host.replace(/\/$/, "") + "/ws";
+const SESSION_KEY = "voicechat.session";
+// マイク取り込み方式: "webm"（MediaRecorder、既定）/ "pcm"（AudioWorklet → raw PCM16。サーバでのデコード不要、LAN 向け）
+const AUDIO_CAPTURE = import.meta.env.VITE_AUDIO_CAPTURE || "webm";
+
+// 再接続時に前回のセッション（モード・履歴）を再開するため token を付ける
+function wsUrl() {
+  const token = sessionStorage.getItem(SESSION_KEY);
+  return token ? `${WS_URL}?session=${encodeURIComponent(token)}` : WS_URL;
+}
 
 export default function App() {
   const [wsReady, setWsReady] = React.useState(false);
@@ -18,10 +28,15 @@ export default function App() {
   const [keyboardMode, setKeyboardMode] = React.useState(false);
   const [messages, setMessages] = React.useState([]); // {role, content}
   const [ephemeralTranscript, setEphemeralTranscript] = React.useState("");
+  const [streamingReply, setStreamingReply] = React.useState(""); // chat_delta の逐次表示
   const [status, setStatus] = React.useState(null);
 
   const wsRef = React.useRef(null);
   const recRef = React.useRef(null);
+  // この接続で入力形式（audio_input）を通知済みか。通知前の音声は送らない
+  const inputSentRef = React.useRef(false);
+  // audio_id → 音声ヘッダ（後続のバイナリフレームと対応付ける）
+  const pendingAudioRef = React.useRef(new Map());
 
   React.useEffect(() => {
     // 初期ステータス取得
@@ -29,23 +44,48 @@ export default function App() {
   }, []);
 
   React.useEffect(() => {
+    const usePcm = AUDIO_CAPTURE === "pcm" && PcmRecorder.isSupported();
+
+    // PCM の場合はサンプルレート（マイク開始後に確定）を接続ごとに最初の音声より前に通知する
+    function sendAudioInput() {
+      if (!wsRef.current?.ready || inputSentRef.current) return;
+      if (usePcm) {
+        const rate = recRef.current?.sampleRate;
+        if (!rate) return;
+        wsRef.current.send(JSON.stringify({ type: "audio_input", format: "pcm16", sample_rate: rate, channels: 1 }));
+      }
+      inputSentRef.current = true;
+    }
+
     // WS接続
-    const ws = new AutoReconnectWS(WS_URL, {
-      onOpen: () => setWsReady(true),
-      onClose: () => setWsReady(false),
+    const ws = new AutoReconnectWS(wsUrl, {
+      onOpen: () => {
+        setWsReady(true);
+        // TTS音声はバイナリフレームで受け取る
+        ws.send(JSON.stringify({ type: "audio_output", binary: true }));
+        inputSentRef.current = false;
+        sendAudioInput();
+        // webm はこの接続のデコーダにヘッダから渡す必要があるので録音をやり直す
+        if (!usePcm) recRef.current?.restart();
+      },
+      onClose: () => {
+        setWsReady(false);
+        inputSentRef.current = false;
+      },
       onMessage: (e) => handleWSMessage(e),
       onError: () => {}
     });
     wsRef.current = ws;
 
     // マイク開始（許可が必要）
-    const rec = new AudioRecorder({
-      chunkMs: 300,
+    const Recorder = usePcm ? PcmRecorder : AudioRecorder;
+    const rec = new Recorder({
+      chunkMs: usePcm ? 100 : 300,
       onData: (buf) => {
-        if (wsRef.current?.ready) wsRef.current.send(buf);
+        if (wsRef.current?.ready && inputSentRef.current) wsRef.current.send(buf);
       }
     });
-    rec.start().catch((err) => {
+    rec.start().then(sendAudioInput).catch((err) => {
       console.error("Mic start failed:", err);
       alert("マイクの使用を許可してください。");
     });
@@ -58,10 +98,34 @@ export default function App() {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, []);
 
+  function handleAudioFrame(buf) {
+    // 先頭4バイト(BE)が audio_id、残りが音声本体
+    if (buf.byteLength < 4) return;
+    const audioId = new DataView(buf).getUint32(0);
+    const meta = pendingAudioRef.current.get(audioId);
+    if (!meta) return;
+    pendingAudioRef.current.delete(audioId);
+    const body = buf.slice(4);
+    if (meta.type === "chat_audio") enqueueAudioBytes(body, meta.mime);
+    else playAudioBytes(body, meta.mime);
+  }
+
   function handleWSMessage(e) {
+    if (e.data instanceof ArrayBuffer) {
+      handleAudioFrame(e.data);
+      return;
+    }
     try {
       const msg = JSON.parse(e.data);
+      if (msg.audio_id) pendingAudioRef.current.set(msg.audio_id, msg);
       switch (msg.type) {
+        case "session":
+          sessionStorage.setItem(SESSION_KEY, msg.token);
+          if (msg.resumed) {
+            setCurrentMode(msg.mode);
+            setShowSidebar(!msg.mode);
+          }
+          break;
         case "mode_changed":
           setCurrentMode(msg.mode);
           setShowSidebar(false);
@@ -72,8 +136,23 @@ export default function App() {
         case "transcript":
           setEphemeralTranscript(msg.text);
           break;
+        case "chat_delta":
+          setStreamingReply((prev) => prev + msg.text);
+          break;
+        case "chat_audio":
+          // 文単位の音声。到着順に連続再生
+          enqueueBase64Wav(msg.audio);
+          break;
+        case "stop_audio":
+          // barge-in / 新しい応答の開始: 再生中・再生待ちの音声を破棄
+          stopPlayback();
+          pendingAudioRef.current.clear();
+          if (msg.text) setMessages((prev) => [...prev, { role: "assistant", content: `${msg.text}…` }]);
+          setStreamingReply("");
+          break;
         case "chat_response":
           setMessages((prev) => [...prev, { role: "assistant", content: msg.text }]);
+          setStreamingReply("");
           if (msg.audio) playBase64Wav(msg.audio);
           setEphemeralTranscript("");
           break;
@@ -88,7 +167,13 @@ export default function App() {
           setShowSidebar(true);
           setEphemeralTranscript("");
           break;
+        case "busy":
+          // サーバ混雑。接続数超過なら指定時間あけて再接続、それ以外は案内のみ
+          if (msg.scope === "sessions") wsRef.current?.retryAfter(msg.retry_after_ms);
+          if (msg.text) setMessages((prev) => [...prev, { role: "assistant", content: `⏳ ${msg.text}` }]);
+          break;
         case "error":
+          setStreamingReply("");
           setMessages((prev) => [...prev, { role: "assistant", content: `⚠️ ${msg.text}` }]);
           break;
         default:
@@ -120,6 +205,18 @@ export default function App() {
     });
     const s = await res.json();
     setStatus((prev) => ({ ...prev, ...s }));
+    // Whisper はバックグラウンドで切替わるので、完了するまでステータスをポーリング
+    if (payload.whisper_model) pollStatusUntilLoaded();
+  }
+
+  async function pollStatusUntilLoaded() {
+    for (;;) {
+      await new Promise((r) => setTimeout(r, 1000));
+      const s = await fetch("/api/status").then(r => r.json()).catch(() => null);
+      if (!s) return;
+      setStatus(s);
+      if (!["loading", "warming_up"].includes(s.whisper_loading?.status)) return;
+    }
   }
 
   return (
@@ -150,6 +247,7 @@ export default function App() {
           <ChatView
             messages={messages}
             ephemeralTranscript={ephemeralTranscript}
+            streamingReply={streamingReply}
             onSendText={sendTextMessage}
             keyboardMode={keyboardMode}
             setKeyboardMode={setKeyboardMode}
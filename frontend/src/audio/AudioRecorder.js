@@ -1,5 +1,6 @@
 // src/audio/AudioRecorder.js
 // マイク常時送信
+// 2つ目以降のチャンクはコンテナヘッダを含まないため、WS を張り直したら restart() で録音をやり直す
 const MIME_PREFERENCES = [
   "audio/webm;codecs=opus",
   "audio/webm",
@@ -20,14 +21,28 @@ export default class AudioRecorder {
     this.mediaStream = await navigator.mediaDevices.getUserMedia({ audio: true });
     const mimeType = MIME_PREFERENCES.find((t) => MediaRecorder.isTypeSupported(t)) || "";
     this.mimeType = mimeType;
+    this._startRecorder();
+  }
 
-    this.recorder = new MediaRecorder(this.mediaStream, mimeType ? { mimeType } : undefined);
-    this.recorder.ondataavailable = async (e) => {
-      if (!e.data || e.data.size === 0) return;
+  _startRecorder() {
+    const recorder = new MediaRecorder(this.mediaStream, this.mimeType ? { mimeType: this.mimeType } : undefined);
+    recorder.ondataavailable = async (e) => {
+      // 止めた録音の残りチャンクは捨てる（新しい録音のヘッダより前に送らない）
+      if (this.recorder !== recorder || !e.data || e.data.size === 0) return;
       const buf = await e.data.arrayBuffer();
       this.onData && this.onData(buf);
     };
-    this.recorder.start(this.chunkMs);
+    this.recorder = recorder;
+    recorder.start(this.chunkMs);
+  }
+
+  // 新しいストリーム（先頭チャンクにヘッダ）として録音し直す。マイクはそのまま
+  restart() {
+    if (!this.mediaStream) return;
+    const old = this.recorder;
+    this.recorder = null;
+    if (old && old.state !== "inactive") old.stop();
+    this._startRecorder();
   }
 
   stop() {
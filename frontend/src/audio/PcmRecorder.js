@@ -0,0 +1,52 @@
+// src/audio/PcmRecorder.js
+// マイク常時送信（raw PCM16）。AudioWorklet で取り込むため、サーバ側のデコード（ffmpeg）が不要
+// AudioRecorder と同じ onData / start / stop。sampleRate は start 後に確定する（audio_input で通知）
+export default class PcmRecorder {
+  constructor({ onData, chunkMs = 100 } = {}) {
+    this.onData = onData;
+    this.chunkMs = chunkMs;
+    this.mediaStream = null;
+    this.context = null;
+    this.node = null;
+    this.sampleRate = null;
+  }
+
+  static isSupported() {
+    return typeof window !== "undefined" && !!window.AudioContext && typeof AudioWorkletNode !== "undefined";
+  }
+
+  async start() {
+    this.mediaStream = await navigator.mediaDevices.getUserMedia({ audio: { channelCount: 1 } });
+    // サンプルレートはデバイス既定のまま（16kHz への変換はサーバ側で行う）
+    this.context = new AudioContext();
+    await this.context.audioWorklet.addModule(new URL("./pcm-worklet.js", import.meta.url));
+    this.sampleRate = this.context.sampleRate;
+
+    const source = this.context.createMediaStreamSource(this.mediaStream);
+    this.node = new AudioWorkletNode(this.context, "pcm-capture", {
+      numberOfInputs: 1,
+      numberOfOutputs: 0,
+      channelCount: 1,
+      channelCountMode: "explicit", // 複数チャンネルのマイクはここで mono にダウンミックス
+      processorOptions: { chunkSamples: Math.round((this.sampleRate * this.chunkMs) / 1000) }
+    });
+    this.node.port.onmessage = (e) => this.onData && this.onData(e.data);
+    source.connect(this.node);
+  }
+
+  stop() {
+    if (this.node) {
+      this.node.port.onmessage = null;
+      this.node.disconnect();
+    }
+    if (this.context) {
+      this.context.close();
+    }
+    if (this.mediaStream) {
+      this.mediaStream.getTracks().forEach((t) => t.stop());
+    }
+    this.node = null;
+    this.context = null;
+    this.mediaStream = null;
+  }
+}
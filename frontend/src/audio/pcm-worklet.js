@@ -0,0 +1,28 @@
+// src/audio/pcm-worklet.js
+// AudioWorklet: マイク入力（mono）を PCM16(s16le) に変換し、chunkSamples ごとにまとめて送る
+class PcmCaptureProcessor extends AudioWorkletProcessor {
+  constructor(options) {
+    super();
+    this.chunkSamples = options.processorOptions.chunkSamples;
+    this.buf = new Int16Array(this.chunkSamples);
+    this.len = 0;
+  }
+
+  process(inputs) {
+    const ch = inputs[0] && inputs[0][0];
+    if (!ch) return true;
+    for (let i = 0; i < ch.length; i++) {
+      const s = Math.max(-1, Math.min(1, ch[i]));
+      this.buf[this.len++] = s < 0 ? s * 0x8000 : s * 0x7fff;
+      if (this.len === this.chunkSamples) {
+        // バッファごと渡す（コピーしない）
+        this.port.postMessage(this.buf.buffer, [this.buf.buffer]);
+        this.buf = new Int16Array(this.chunkSamples);
+        this.len = 0;
+      }
+    }
+    return true;
+  }
+}
+
+registerProcessor("pcm-capture", PcmCaptureProcessor);
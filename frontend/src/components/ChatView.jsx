@@ -5,6 +5,7 @@ import React, { useRef, useEffect } from "react";
 export default function ChatView({
   messages,
   ephemeralTranscript,
+  streamingReply,
   onSendText,
   keyboardMode,
   setKeyboardMode,
@@ -13,7 +14,7 @@ export default function ChatView({
   const endRef = useRef(null);
   useEffect(() => {
     endRef.current?.scrollIntoView({ behavior: "smooth" });
-  }, [messages, ephemeralTranscript]);
+  }, [messages, ephemeralTranscript, streamingReply]);
 
   return (
     <section className="chat">
@@ -42,6 +43,9 @@ export default function ChatView({
         {ephemeralTranscript ? (
           <div className="bubble user ephemeral">{ephemeralTranscript}</div>
         ) : null}
+        {streamingReply ? (
+          <div className="bubble assistant ephemeral">{streamingReply}</div>
+        ) : null}
         <div ref={endRef} />
       </div>
 
@@ -31,6 +31,16 @@ export default function ModelPanel({ status, onChange }) {
       {status && (
         <div className="status">
           <div>ESPnet: {status.espnet_model} ({status.espnet_device})</div>
+          {status.whisper_loading && (
+            <div>
+              Whisper: {status.whisper_loading.current || "-"}
+              {["loading", "warming_up"].includes(status.whisper_loading.status)
+                ? ` （${status.whisper_loading.target} を${status.whisper_loading.status === "loading" ? "ロード" : "ウォームアップ"}中…）`
+                : status.whisper_loading.status === "error"
+                  ? ` （切替失敗: ${status.whisper_loading.error}）`
+                  : ""}
+            </div>
+          )}
           <div>利用可能モード: {status.modes?.join(" / ")}</div>
         </div>
       )}
@@ -1,14 +1,80 @@
 // src/utils/audio.js
 // Base64 WAV再生
-export function playBase64Wav(base64) {
-  if (!base64) return;
+function base64ToWavUrl(base64) {
   const byteString = atob(base64);
   const len = byteString.length;
   const bytes = new Uint8Array(len);
   for (let i = 0; i < len; i++) bytes[i] = byteString.charCodeAt(i);
   const blob = new Blob([bytes.buffer], { type: "audio/wav" });
-  const url = URL.createObjectURL(blob);
+  return URL.createObjectURL(blob);
+}
+
+// 再生中の Audio（barge-in 時にまとめて停止する）
+const active = new Set();
+let generation = 0; // stopPlayback ごとに進め、停止前の再生の完了通知を無視する
+
+function playUrl(url, onDone) {
   const audio = new Audio(url);
-  audio.onended = () => URL.revokeObjectURL(url);
-  audio.play().catch(() => {/* autoplay対策で失敗する場合あり */});
+  const gen = generation;
+  let finished = false;
+  active.add(audio);
+  const done = () => {
+    if (finished) return;
+    finished = true;
+    active.delete(audio);
+    URL.revokeObjectURL(url);
+    if (onDone && gen === generation) onDone();
+  };
+  audio.onended = done;
+  audio.onerror = done;
+  audio.play().catch(done);
+}
+
+export function playBase64Wav(base64) {
+  if (!base64) return;
+  playUrl(base64ToWavUrl(base64));
+}
+
+// 文単位で届く音声を到着順に途切れなく再生するキュー
+const playQueue = [];
+let playing = false;
+
+function playNext() {
+  const url = playQueue.shift();
+  if (!url) {
+    playing = false;
+    return;
+  }
+  playing = true;
+  playUrl(url, playNext);
+}
+
+export function enqueueBase64Wav(base64) {
+  if (!base64) return;
+  playQueue.push(base64ToWavUrl(base64));
+  if (!playing) playNext();
+}
+
+// バイナリフレームで届いた音声（wav/ogg/opus）の再生
+export function playAudioBytes(bytes, mime = "audio/wav") {
+  if (!bytes || bytes.byteLength === 0) return;
+  playUrl(URL.createObjectURL(new Blob([bytes], { type: mime })));
+}
+
+export function enqueueAudioBytes(bytes, mime = "audio/wav") {
+  if (!bytes || bytes.byteLength === 0) return;
+  playQueue.push(URL.createObjectURL(new Blob([bytes], { type: mime })));
+  if (!playing) playNext();
+}
+
+// 再生中・再生待ちの音声をすべて破棄（サーバからの stop_audio / barge-in）
+export function stopPlayback() {
+  generation += 1;
+  while (playQueue.length) URL.revokeObjectURL(playQueue.shift());
+  playing = false;
+  for (const audio of active) {
+    audio.pause();
+    URL.revokeObjectURL(audio.src);
+  }
+  active.clear();
 }
@@ -6,12 +6,15 @@ export default class AutoReconnectWS {
     this.handlers = { onOpen, onClose, onMessage, onError };
     this.ws = null;
     this._retry = 0;
+    this._retryAfterMs = null; // サーバが busy で指定した次回の再接続待ち
     this._manualClose = false;
     this._connect();
   }
 
   _connect() {
-    this.ws = new WebSocket(this.url);
+    // url は関数も可（再接続のたびにセッショントークン等を付け直すため）
+    const url = typeof this.url === "function" ? this.url() : this.url;
+    this.ws = new WebSocket(url);
     this.ws.binaryType = "arraybuffer";
 
     this.ws.onopen = (e) => {
@@ -26,7 +29,9 @@ export default class AutoReconnectWS {
     this.ws.onclose = (e) => {
       this.handlers.onClose && this.handlers.onClose(e);
       if (!this._manualClose) {
-        const delay = Math.min(1000 * 2 ** this._retry, 15000);
+        const backoff = Math.min(1000 * 2 ** this._retry, 15000);
+        const delay = Math.max(backoff, this._retryAfterMs ?? 0);
+        this._retryAfterMs = null;
         this._retry++;
         setTimeout(() => this._connect(), delay);
       }
@@ -37,6 +42,11 @@ export default class AutoReconnectWS {
     };
   }
 
+  // 次の再接続をこの時間以上あける（サーバが混雑を通知したとき）
+  retryAfter(ms) {
+    this._retryAfterMs = ms;
+  }
+
   send(data) {
     if (this.ws && this.ws.readyState === WebSocket.OPEN) {
       this.ws.send(data);